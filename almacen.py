@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén columnar (Parquet) para las tablas del sistema.
+
+Los CSV se convierten una sola vez a Parquet tipado en el directorio 'datos/'.
+A partir de ahí cada módulo lee sólo las columnas y los grupos de filas que
+necesita, en lugar de parsear los CSV completos en cada arranque. Los tipos,
+las columnas categóricas y el formato de las fechas se declaran en `esquema`.
+
+Cada tabla es un directorio con una o más partes Parquet; las transacciones
+nuevas se añaden como partes adicionales. Toda modificación incrementa la
+versión de los datos, que es la llave con la que la aplicación invalida sus
+caches.
+"""
+
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import esquema
+
+
+DIRECTORIO_DATOS = 'datos'
+
+ARCHIVOS_CSV = {
+    'afiliados': 'afiliados.csv',
+    'proyecciones': 'proyecciones_pensiones.csv',
+    'fondos': 'fondos_inversion.csv',
+    'transacciones': 'transacciones.csv',
+}
+
+FILAS_POR_GRUPO = 256 * 1024
+# Último cambio de salario por afiliado, registrado al reconvertir afiliados.csv
+TABLA_HISTORIAL_SALARIOS = 'historial_salarios'
+
+# Una sola conversión a la vez por proceso (varias sesiones de Streamlit comparten el proceso)
+_candado_conversion = threading.Lock()
+
+
+def ruta_tabla(tabla):
+    """Directorio del almacén donde vive `tabla` (un archivo Parquet por parte)."""
+    return os.path.join(DIRECTORIO_DATOS, tabla)
+
+
+def version_datos():
+    """Versión actual de los datos del almacén (0 si nunca se ha escrito)."""
+    try:
+        with open(os.path.join(DIRECTORIO_DATOS, 'version.json'), encoding='utf-8') as archivo:
+            return json.load(archivo)['version']
+    except FileNotFoundError:
+        return 0
+
+
+def _temporal(destino):
+    """Archivo temporal propio de este proceso e hilo junto a `destino`, para reemplazarlo con os.replace."""
+    return f'{destino}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def incrementar_version():
+    """Marca un cambio en los datos y devuelve la nueva versión."""
+    version = version_datos() + 1
+    os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO_DATOS, 'version.json')
+    temporal = _temporal(ruta)
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump({'version': version}, archivo)
+    os.replace(temporal, ruta)
+    return version
+
+
+def _partes(tabla):
+    ruta = ruta_tabla(tabla)
+    if not os.path.isdir(ruta):
+        return []
+    return sorted(os.path.join(ruta, f) for f in os.listdir(ruta) if f.endswith('.parquet'))
+
+
+def _parte_csv(tabla):
+    """Parte con la conversión del CSV; las siguientes son lotes ingeridos después."""
+    return os.path.join(ruta_tabla(tabla), 'parte-00000.parquet')
+
+
+def requiere_conversion(tabla):
+    """True si la tabla no está en el almacén o su CSV es más reciente que la conversión."""
+    if not os.path.exists(_parte_csv(tabla)):
+        return True
+    csv = ARCHIVOS_CSV[tabla]
+    return os.path.exists(csv) and os.path.getmtime(csv) > os.path.getmtime(_parte_csv(tabla))
+
+
+def ruta_rechazos(tabla):
+    """CSV con las filas rechazadas en la última conversión de `tabla`."""
+    return os.path.join(DIRECTORIO_DATOS, 'rechazos', f'{tabla}.csv')
+
+
+def convertir_csv(tabla):
+    """
+    Convierte el CSV de `tabla` a Parquet leyendo por bloques para acotar la memoria.
+
+    Sólo se reemplaza la parte del CSV; las partes añadidas con
+    `agregar_parte` se conservan. Las filas que no cumplen el esquema se
+    omiten y se guardan en `ruta_rechazos`; se devuelven como DataFrame.
+    """
+    os.makedirs(ruta_tabla(tabla), exist_ok=True)
+    destino = _parte_csv(tabla)
+    temporal = _temporal(destino)
+    # Los salarios de la conversión anterior, para registrar los cambios al reemplazarla
+    previos = (pd.read_parquet(destino, columns=['id', 'salario'])
+               if tabla == 'afiliados' and os.path.exists(destino) else None)
+    rechazos = []
+    with pq.ParquetWriter(temporal, esquema.ESQUEMAS[tabla]) as escritor:
+        for lote, rechazados in esquema.leer_csv(ARCHIVOS_CSV[tabla], tabla):
+            escritor.write_table(lote, row_group_size=FILAS_POR_GRUPO)
+            rechazos.append(rechazados)
+    os.replace(temporal, destino)
+    incrementar_version()
+    if previos is not None:
+        registrar_cambios_salario(previos, pd.Timestamp.now())
+
+    rechazos = pd.concat(rechazos, ignore_index=True) if rechazos else pd.DataFrame(
+        columns=esquema.COLUMNAS_RECHAZOS)
+    if len(rechazos):
+        os.makedirs(os.path.dirname(ruta_rechazos(tabla)), exist_ok=True)
+        rechazos.to_csv(ruta_rechazos(tabla), index=False)
+    elif os.path.exists(ruta_rechazos(tabla)):
+        os.remove(ruta_rechazos(tabla))
+    return rechazos
+
+
+def registrar_cambios_salario(previos, fecha):
+    """
+    Actualiza `TABLA_HISTORIAL_SALARIOS` con los afiliados cuyo salario cambió.
+
+    `previos` son id y salario antes de la conversión; cada afiliado que cambió
+    queda con su salario anterior, el nuevo y `fecha`. Los demás conservan su
+    último registro.
+    """
+    actuales = pd.read_parquet(_parte_csv('afiliados'), columns=['id', 'salario'])
+    cruce = actuales.merge(previos, on='id', suffixes=('', '_anterior'))
+    cambios = cruce[cruce['salario'] != cruce['salario_anterior']].assign(fecha_cambio=fecha)
+    if version_tabla(TABLA_HISTORIAL_SALARIOS) is not None:
+        historial = cargar_tabla(TABLA_HISTORIAL_SALARIOS)
+        cambios = pd.concat([historial[~historial['id'].isin(cambios['id'])], cambios], ignore_index=True)
+    elif cambios.empty:
+        return
+    escribir_tabla(TABLA_HISTORIAL_SALARIOS, cambios, version_datos())
+
+
+def agregar_parte(tabla, datos):
+    """
+    Añade `datos` (con el esquema del CSV de `tabla`) como una nueva parte.
+
+    Devuelve el bloque ya tipado tal como quedó escrito.
+    """
+    partes = _partes(tabla)
+    lote = esquema.tipar(tabla, datos)
+    if partes:
+        lote = lote.select(pq.read_schema(partes[0]).names).cast(pq.read_schema(partes[0]))
+    ruta = ruta_tabla(tabla)
+    os.makedirs(ruta, exist_ok=True)
+    destino = os.path.join(ruta, f'parte-{len(partes):05d}.parquet')
+    temporal = _temporal(destino)
+    pq.write_table(lote, temporal, row_group_size=FILAS_POR_GRUPO)
+    os.replace(temporal, destino)
+    return lote.to_pandas()
+
+
+def escribir_tabla(tabla, datos, version, **metadatos):
+    """
+    Reemplaza una tabla derivada (agregados, índices, etc.) calculada sobre `version`.
+
+    `metadatos` (valores serializables a JSON) se guardan con la tabla y se
+    leen con `metadatos_tabla`.
+    """
+    ruta = ruta_tabla(tabla)
+    os.makedirs(ruta, exist_ok=True)
+    lote = pa.Table.from_pandas(datos, preserve_index=False)
+    lote = lote.replace_schema_metadata({**(lote.schema.metadata or {}), b'version': str(version).encode(),
+                                         **{f'extra:{clave}'.encode(): json.dumps(valor).encode()
+                                            for clave, valor in metadatos.items()}})
+    destino = os.path.join(ruta, 'parte-00000.parquet')
+    temporal = _temporal(destino)
+    pq.write_table(lote, temporal, row_group_size=FILAS_POR_GRUPO)
+    os.replace(temporal, destino)
+
+
+def version_tabla(tabla):
+    """Versión de los datos con la que se escribió una tabla derivada (None si no existe)."""
+    partes = _partes(tabla)
+    if not partes:
+        return None
+    metadatos = pq.read_schema(partes[0]).metadata or {}
+    return int(metadatos[b'version']) if b'version' in metadatos else None
+
+
+def metadatos_tabla(tabla):
+    """Metadatos guardados con `escribir_tabla` (diccionario vacío si la tabla no existe)."""
+    partes = _partes(tabla)
+    if not partes:
+        return {}
+    metadatos = pq.read_schema(partes[0]).metadata or {}
+    return {clave[len(b'extra:'):].decode(): json.loads(valor)
+            for clave, valor in metadatos.items() if clave.startswith(b'extra:')}
+
+
+def firmas_partes(tabla):
+    """
+    Nombre de cada parte de `tabla` con su tamaño y fecha de modificación.
+
+    Sirve para saber qué partes ya se procesaron: las partes sólo se añaden,
+    y una parte reescrita (p. ej. al reconvertir el CSV) cambia de firma.
+    """
+    firmas = {}
+    for parte in _partes(tabla):
+        estado = os.stat(parte)
+        firmas[os.path.basename(parte)] = f'{estado.st_size}-{estado.st_mtime_ns}'
+    return firmas
+
+
+def asegurar_almacen():
+    """
+    Convierte las tablas cuyo Parquet falte o esté desactualizado respecto al CSV.
+
+    Los hilos del proceso se turnan; el que llega después ya encuentra las
+    tablas convertidas y no repite el trabajo.
+    """
+    with _candado_conversion:
+        for tabla in ARCHIVOS_CSV:
+            if requiere_conversion(tabla):
+                convertir_csv(tabla)
+
+
+def _dataset(tabla, partes=None):
+    formato = ds.ParquetFileFormat(read_options={'dictionary_columns': esquema.CATEGORICAS.get(tabla, [])})
+    archivos = _partes(tabla) if partes is None else [os.path.join(ruta_tabla(tabla), parte) for parte in partes]
+    return ds.dataset(archivos, format=formato)
+
+
+def cargar_tabla(tabla, columnas=None, filtro=None):
+    """
+    Carga `tabla` del almacén como DataFrame.
+
+    `columnas` limita las columnas leídas y `filtro` (una expresión de
+    pyarrow.dataset, p. ej. ``ds.field('id_afiliado') == 5``) descarta los
+    grupos de filas que no pueden contener coincidencias.
+    """
+    return _dataset(tabla).to_table(columns=columnas, filter=filtro).to_pandas()
+
+
+def iterar_lotes(tabla, columnas=None, filtro=None, tamaño_lote=FILAS_POR_GRUPO, partes=None):
+    """Recorre `tabla` (o sólo los archivos `partes`) en DataFrames de a lo más `tamaño_lote` filas."""
+    for lote in _dataset(tabla, partes).to_batches(columns=columnas, filter=filtro, batch_size=tamaño_lote):
+        if lote.num_rows:
+            yield lote.to_pandas()
+
+
+def contar_filas(tabla, filtro=None):
+    """Número de filas de `tabla` sin materializar sus columnas."""
+    return _dataset(tabla).count_rows(filter=filtro)
+
+
+def rango_columna(tabla, columna):
+    """``(mínimo, máximo)`` de `columna` leído de las estadísticas de los grupos de filas, sin leer datos."""
+    minimos, maximos = [], []
+    for parte in _partes(tabla):
+        metadatos = pq.ParquetFile(parte).metadata
+        indice = metadatos.schema.to_arrow_schema().get_field_index(columna)
+        for grupo in range(metadatos.num_row_groups):
+            estadisticas = metadatos.row_group(grupo).column(indice).statistics
+            if estadisticas is not None and estadisticas.has_min_max:
+                minimos.append(estadisticas.min)
+                maximos.append(estadisticas.max)
+    return (min(minimos), max(maximos)) if minimos else (None, None)
@@ -12,11 +12,25 @@ import plotly.express as px
 from datetime import datetime
 import os
 
+import almacen
+import graficas
+import instrumentacion
+import cumplimiento
+import montecarlo
+import nucleo
+import optimizacion
+import perezoso
+import proyeccion
+import tabla
+
 
 
 # Configuración inicial
 st.set_page_config(page_title="AFORE PENSIONISSSTE - Sistema de Agentes Inteligentes", layout="wide")
 
+# El reporte de carga útil sólo muestra las gráficas de esta ejecución
+graficas.reiniciar_reporte()
+
 
 # Estilo de fondo
 page_bg_img = """
@@ -42,10 +56,8 @@ st.sidebar.title("Sistema Integral de Agentes Inteligentes para AFORE PENSIONISS
 st.sidebar.write("Desarrollado por: **Javier Horacio Pérez Ricárdez**")
 
 
-# Cargar datos desde CSV (en un caso real, estos archivos estarían en un directorio 'data/')
-@st.cache_data
-def load_data():
-    # Crear datos simulados si no existen
+# Crear datos simulados si no existen (en un caso real, estos archivos estarían en un directorio 'data/')
+def crear_datos_simulados():
     if not os.path.exists('afiliados.csv'):
         afiliados = pd.DataFrame({
             'id': range(1, 11),
@@ -94,43 +106,83 @@ def load_data():
     if not os.path.exists('transacciones.csv'):
         transactions = pd.DataFrame({
             'id_afiliado': [1,1,2,3,4,5,6,7,8,9],
-            'fecha': ['2024-01-15', '2024-02-18', '2024-01-20', '2024-01-10', '2024-02-05',
-                     '2024-01-22', '2024-02-28', '2024-01-30', '2024-02-12', '2024-01-08'],
+            'fecha': ['15/01/2024', '18/02/2024', '20/01/2024', '10/01/2024', '05/02/2024',
+                     '22/01/2024', '28/02/2024', '30/01/2024', '12/02/2024', '08/01/2024'],
             'monto': [2500, 2500, 1500, 1000, 3000, 800, 2000, 1800, 1200, 900],
             'tipo': ['Aportación']*10,
             'concepto': ['Voluntaria']*10
         })
         transactions.to_csv('transacciones.csv', index=False)
 
-    # Cargar los archivos
-    afiliados = pd.read_csv('afiliados.csv')
-    proyecciones = pd.read_csv('proyecciones_pensiones.csv')
-    fondos = pd.read_csv('fondos_inversion.csv')
-    transacciones = pd.read_csv('transacciones.csv')
 
-    # Convertir fechas
-    transacciones['fecha'] = pd.to_datetime(transacciones['fecha'])
+# Simulaciones Monte Carlo (cacheadas por parámetros para no repetirlas en cada rerun)
+@instrumentacion.cacheada(st.cache_data(show_spinner="Simulando trayectorias de rendimiento..."))
+def simular_bandas(edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion,
+                   rendimiento, volatilidad, n_trayectorias):
+    return montecarlo.bandas_pension(edad, salario, años_cotizacion, aportacion, tasa_crecimiento,
+                                     edad_jubilacion, rendimiento, volatilidad, n_trayectorias)
+
+@instrumentacion.cacheada(st.cache_data(show_spinner="Simulando trayectorias de rendimiento..."))
+def comparar_fondos(fondos, edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion,
+                    n_trayectorias):
+    return montecarlo.comparar_fondos(fondos, edad, salario, años_cotizacion, aportacion, tasa_crecimiento,
+                                      edad_jubilacion, n_trayectorias)
+
+# Una vez por proceso: las sesiones no repiten la revisión de los CSV en cada ejecución
+@instrumentacion.cacheada(st.cache_resource)
+def preparar_almacen():
+    crear_datos_simulados()
+    almacen.asegurar_almacen()
+
+# Tablas derivadas perezosas, compartidas entre sesiones: cada página calcula sólo los nodos que usa
+@instrumentacion.cacheada(st.cache_resource)
+def cargar_grafo():
+    return perezoso.GrafoDatos()
+
+# Índices de orden para las tablas paginadas. Hay una entrada por tabla y versión de los datos: el
+# límite deja lugar a las tablas de la versión actual y desaloja las de versiones anteriores
+TABLAS_EN_CACHE = 8
+
+@instrumentacion.cacheada(st.cache_resource(max_entries=TABLAS_EN_CACHE))
+def construir_tabla(_datos, nombre, version, columnas):
+    return tabla.TablaOrdenable(_datos, columnas)
 
-    # Unir datos de afiliados con proyecciones
-    datos_completos = pd.merge(afiliados, proyecciones, on='id')
-    return datos_completos, fondos, transacciones
+COLUMNAS_ORDEN_AFILIADOS = ('id', 'nombre', 'edad', 'salario', 'pension_proyectada_base',
+                            'fondo_actual', 'riesgo_pension_insuficiente')
+FILTROS_AFILIADOS = ('nombre', 'fondo_actual', 'riesgo_pension_insuficiente')
 
-# Cargar datos
-df_afiliados, df_fondos, df_transacciones = load_data()
+# Panel de rendimiento oculto: sólo aparece con ?admin=<PENSIONISSSTE_ADMIN> en la URL
+PAGINA_RENDIMIENTO = "Rendimiento (administración)"
+ADMIN = os.environ.get('PENSIONISSSTE_ADMIN')
 
 # Menú principal
-menu = st.sidebar.selectbox("Módulos del Sistema", [
+modulos = [
     "Dashboard General",
     "Agentes de Predicción de Pensiones",
     "Agentes de Asesoría Financiera",
     "Agentes de Gestión de Inversiones",
     "Agentes de Análisis de Comportamiento",
     "Agentes de Supervisión de Riesgos"
-])
+]
+if ADMIN and st.query_params.get('admin') == ADMIN:
+    modulos.append(PAGINA_RENDIMIENTO)
+menu = st.sidebar.selectbox("Módulos del Sistema", modulos)
+
+# Cada ejecución del script es una traza; sus etapas se miden como tramos
+instrumentacion.iniciar_traza(f"pagina:{menu}")
+
+# Cargar datos (convirtiendo a Parquet si falta o si cambió algún CSV; se revisa una vez por proceso)
+preparar_almacen()
+version_datos = almacen.version_datos()
+grafo = cargar_grafo()
+
+def datos(nombre):
+    return grafo.obtener(nombre, version_datos)
 
 # Contenido según selección del menú
 if menu == "Dashboard General":
     st.header("Dashboard General - Visión Integral")
+    df_afiliados = datos('afiliados_completos')
 
     # Métricas clave
     col1, col2, col3 = st.columns(3)
@@ -144,17 +196,18 @@ if menu == "Dashboard General":
 
     # Gráficos
     st.subheader("Distribución de Pensiones Proyectadas")
-    fig = px.histogram(df_afiliados, x='pension_proyectada_base', nbins=10,
-                      title="Distribución de Pensiones Proyectadas",
-                      labels={'pension_proyectada_base': 'Pensión mensual proyectada ($)'})
-    st.plotly_chart(fig, use_container_width=True)
+    fig = graficas.histograma(df_afiliados['pension_proyectada_base'], nbins=10,
+                              title="Distribución de Pensiones Proyectadas",
+                              label='Pensión mensual proyectada ($)')
+    graficas.mostrar(fig, "Distribución de pensiones")
 
     st.subheader("Distribución por Tipo de Fondo de Inversión")
-    fig = px.pie(df_afiliados, names='fondo_actual', title="Afiliados por Tipo de Fondo")
-    st.plotly_chart(fig, use_container_width=True)
+    fig = graficas.pastel(datos('distribucion_fondos'), title="Afiliados por Tipo de Fondo")
+    graficas.mostrar(fig, "Afiliados por fondo")
 
     st.subheader("Resumen de Datos de Afiliados")
-    st.dataframe(df_afiliados)
+    tabla.tabla_paginada(construir_tabla(df_afiliados, 'afiliados', version_datos, COLUMNAS_ORDEN_AFILIADOS),
+                         'resumen_afiliados', filtros=FILTROS_AFILIADOS)
 
 elif menu == "Agentes de Predicción de Pensiones":
     st.header("Agentes de Predicción de Pensiones")
@@ -166,8 +219,10 @@ elif menu == "Agentes de Predicción de Pensiones":
     """)
     
     st.subheader("Proyecciones Actuales de los Afiliados")
-    st.dataframe(df_afiliados[['id', 'nombre', 'edad', 'años_cotizacion', 'pension_proyectada_base',
-                             'riesgo_pension_insuficiente', 'recomendacion_aportacion']])
+    tabla.tabla_paginada(construir_tabla(datos('afiliados_completos'), 'afiliados', version_datos, COLUMNAS_ORDEN_AFILIADOS),
+                         'proyecciones_afiliados', filtros=FILTROS_AFILIADOS,
+                         columnas=['id', 'nombre', 'edad', 'años_cotizacion', 'pension_proyectada_base',
+                                   'riesgo_pension_insuficiente', 'recomendacion_aportacion'])
 
     st.subheader("Simulador de Proyección de Pensión")
     with st.form("simulador_pension"):
@@ -184,12 +239,9 @@ elif menu == "Agentes de Predicción de Pensiones":
         submitted = st.form_submit_button("Calcular Proyección")
     
     if submitted:
-        años_restantes = edad_jubilacion - edad
-        
         # Cálculo simplificado para demostración
-        pension_base = (salario * años_cotizacion * 0.05)
-        pension_aportaciones = (aportacion_voluntaria * 12 * años_restantes * 1.03)
-        pension_proyectada = (pension_base + pension_aportaciones) * (1 + (tasa_crecimiento/100 * años_restantes))
+        pension_proyectada = proyeccion.pension_proyectada(edad, salario, años_cotizacion, aportacion_voluntaria,
+                                                           tasa_crecimiento, edad_jubilacion)
         
         st.success(f"**Pensión mensual proyectada:** ${pension_proyectada:.2f}")
         
@@ -203,13 +255,48 @@ elif menu == "Agentes de Predicción de Pensiones":
             """)
         
         # Gráfico de proyección
-        años = list(range(edad, edad_jubilacion + 1))
-        proyeccion = [pension_base * (1 + (tasa_crecimiento/100 * (x - edad))) + 
-                     (aportacion_voluntaria * 12 * (x - edad) * 1.03) for x in años]
+        años, curva = proyeccion.curva_proyeccion(edad, salario, años_cotizacion, aportacion_voluntaria,
+                                                  tasa_crecimiento, edad_jubilacion)
         
-        fig = px.line(x=años, y=proyeccion, title="Proyección de Pensión",
+        fig = px.line(x=años, y=curva[0], title="Proyección de Pensión",
                      labels={'x': 'Edad', 'y': 'Pensión mensual proyectada ($)'})
-        st.plotly_chart(fig, use_container_width=True)
+        graficas.mostrar(fig, "Proyección de pensión")
+
+    st.subheader("Simulación Monte Carlo de Pensión")
+    with st.form("simulador_montecarlo"):
+        col1, col2 = st.columns(2)
+        with col1:
+            afiliado_id = st.selectbox("Afiliado", datos('afiliados')['id'], key="afiliado_montecarlo")
+            fondo = st.selectbox("Fondo de inversión", datos('fondos')['fondo'], key="fondo_montecarlo")
+            trayectorias = st.select_slider("Número de trayectorias", [1000, 5000, 10000, 20000], 10000,
+                                            key="trayectorias_montecarlo")
+        with col2:
+            aportacion_voluntaria = st.number_input("Aportación voluntaria mensual ($)", 0, 10000, 1000,
+                                                    key="aportacion_montecarlo")
+            tasa_crecimiento = st.slider("Tasa de crecimiento salarial anual estimada (%)", 0.0, 10.0, 3.5,
+                                         key="tasa_montecarlo")
+        simular = st.form_submit_button("Simular Trayectorias")
+
+    if simular:
+        afiliado = datos('indice_afiliados').afiliado(afiliado_id)
+        parametros = montecarlo.parametros_fondos(datos('fondos')).loc[fondo]
+        bandas = simular_bandas(int(afiliado['edad']), float(afiliado['salario']), int(afiliado['años_cotizacion']),
+                                aportacion_voluntaria, tasa_crecimiento, int(afiliado['edad_jubilacion']),
+                                parametros['rendimiento_neto'], parametros['volatilidad'], trayectorias)
+        final = bandas.iloc[-1]
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Escenario pesimista (P5)", f"${final['p5']:,.2f}")
+        with col2:
+            st.metric("Escenario central (P50)", f"${final['p50']:,.2f}")
+        with col3:
+            st.metric("Escenario optimista (P95)", f"${final['p95']:,.2f}")
+
+        fig = px.line(bandas, x='edad', y=[c for c in bandas.columns if c != 'edad'],
+                     title=f"Bandas de percentiles con fondo {fondo} ({trayectorias:,} trayectorias)",
+                     labels={'edad': 'Edad', 'value': 'Pensión mensual proyectada ($)', 'variable': 'Percentil'})
+        graficas.mostrar(fig, "Bandas Monte Carlo")
 
 elif menu == "Agentes de Asesoría Financiera":
     st.header("Agentes de Asesoría Financiera Personalizada")
@@ -221,8 +308,9 @@ elif menu == "Agentes de Asesoría Financiera":
     """)
     
     st.subheader("Seleccione un Afiliado para Análisis")
-    afiliado_id = st.selectbox("Afiliado", df_afiliados['id'])
-    afiliado = df_afiliados[df_afiliados['id'] == afiliado_id].iloc[0]
+    indice = datos('indice_transacciones')
+    afiliado_id = st.selectbox("Afiliado", datos('afiliados')['id'])
+    afiliado = indice.afiliado(afiliado_id)
     
     col1, col2 = st.columns(2)
     with col1:
@@ -266,18 +354,18 @@ elif menu == "Agentes de Asesoría Financiera":
         """)
     
     st.subheader("Historial de Aportaciones")
-    transacciones_afiliado = df_transacciones[df_transacciones['id_afiliado'] == afiliado_id]
+    transacciones_afiliado = indice.transacciones_de(afiliado_id)
     
     if not transacciones_afiliado.empty:
-        fig = px.bar(transacciones_afiliado, x='fecha', y='monto',
-                    title=f"Aportaciones voluntarias de {afiliado['nombre']}",
-                    labels={'monto': 'Monto ($)', 'fecha': 'Fecha'})
-        st.plotly_chart(fig, use_container_width=True)
+        fig = graficas.barras_por_fecha(transacciones_afiliado, x='fecha', y='monto',
+                                        title=f"Aportaciones voluntarias de {afiliado['nombre']}",
+                                        labels={'monto': 'Monto ($)', 'fecha': 'Fecha'})
+        graficas.mostrar(fig, "Historial de aportaciones")
     else:
         st.info("No se encontraron aportaciones voluntarias registradas para este afiliado.")
     
     st.subheader("Opciones de Fondos de Inversión")
-    st.dataframe(df_fondos)
+    st.dataframe(datos('fondos'))
 
 elif menu == "Agentes de Gestión de Inversiones":
     st.header("Agentes de Gestión de Inversiones y Fondos")
@@ -288,25 +376,68 @@ elif menu == "Agentes de Gestión de Inversiones":
     - Supervisión de rentabilidad y riesgo
     """)
     
+    df_fondos = datos('fondos')
+    indice = datos('indice_afiliados')
+
     st.subheader("Rendimiento de Fondos de Inversión")
     fig = px.bar(df_fondos, x='fondo', y='rendimiento_anual',
                 title='Rendimiento Anual Esperado por Tipo de Fondo',
                 labels={'rendimiento_anual': 'Rendimiento (%)', 'fondo': 'Tipo de Fondo'})
-    st.plotly_chart(fig, use_container_width=True)
+    graficas.mostrar(fig, "Rendimiento de fondos")
+
+    st.subheader("Simulación Monte Carlo por Fondo")
+    with st.form("montecarlo_fondos"):
+        col1, col2 = st.columns(2)
+        with col1:
+            afiliado_id = st.selectbox("Afiliado", datos('afiliados')['id'], key="afiliado_montecarlo_fondos")
+        with col2:
+            aportacion_voluntaria = st.number_input("Aportación voluntaria mensual ($)", 0, 10000, 1000,
+                                                    key="aportacion_montecarlo_fondos")
+        comparar = st.form_submit_button("Comparar Fondos")
+
+    if comparar:
+        afiliado = indice.afiliado(afiliado_id)
+        comparacion = comparar_fondos(df_fondos, int(afiliado['edad']), float(afiliado['salario']),
+                                      int(afiliado['años_cotizacion']), aportacion_voluntaria, 3.5,
+                                      int(afiliado['edad_jubilacion']), 10000)
+        fig = px.bar(comparacion, x='fondo', y='p50',
+                    error_y=comparacion['p95'] - comparacion['p50'],
+                    error_y_minus=comparacion['p50'] - comparacion['p5'],
+                    title=f"Pensión proyectada de {afiliado['nombre']} por fondo (P50 con banda P5-P95)",
+                    labels={'p50': 'Pensión mensual proyectada ($)', 'fondo': 'Tipo de Fondo'})
+        graficas.mostrar(fig, "Monte Carlo por fondo")
+        st.dataframe(comparacion.rename(columns={'fondo': 'Fondo'}))
     
     st.subheader("Distribución Actual de Afiliados por Fondos")
-    distribucion_fondos = df_afiliados['fondo_actual'].value_counts().reset_index()
-    distribucion_fondos.columns = ['Fondo', 'Cantidad de Afiliados']
-    fig = px.pie(distribucion_fondos, names='Fondo', values='Cantidad de Afiliados',
-                title="Distribución de Afiliados por Tipo de Fondo")
-    st.plotly_chart(fig, use_container_width=True)
+    fig = graficas.pastel(datos('distribucion_fondos'), title="Distribución de Afiliados por Tipo de Fondo")
+    graficas.mostrar(fig, "Distribución por fondo")
+
+    st.subheader("Asignación Óptima de Fondos")
+    asignacion = datos('asignacion_fondos')
+    movimientos = optimizacion.reasignaciones(asignacion, df_fondos)
+    fig = px.bar(movimientos, x='fondo', y=['afiliados_actuales', 'afiliados_recomendados'], barmode='group',
+                 title='Afiliados por fondo: asignación actual vs. recomendada',
+                 labels={'value': 'Afiliados', 'fondo': 'Tipo de Fondo', 'variable': 'Asignación'})
+    graficas.mostrar(fig, "Asignación óptima")
+    st.dataframe(movimientos.rename(columns={
+        'fondo': 'Fondo', 'afiliados_actuales': 'Actuales', 'afiliados_recomendados': 'Recomendados',
+        'entran': 'Entran', 'salen': 'Salen'}))
+    st.write(f"Afiliados con cambio de fondo recomendado: "
+             f"**{int((asignacion['fondo_actual'] != asignacion['fondo_recomendado']).sum()):,}**")
     
     st.subheader("Simulador de Cambio de Fondo")
     with st.form("simulador_fondo"):
-        afiliado_id = st.selectbox("Seleccione afiliado", df_afiliados['id'])
-        fondo_actual = df_afiliados[df_afiliados['id'] == afiliado_id]['fondo_actual'].values[0]
+        afiliado_id = st.selectbox("Seleccione afiliado", datos('afiliados')['id'])
+        fondo_actual = indice.afiliado(afiliado_id)['fondo_actual']
         st.write(f"Fondo actual: **{fondo_actual}**")
         nuevo_fondo = st.selectbox("Seleccione nuevo fondo", df_fondos['fondo'])
+        col1, col2 = st.columns(2)
+        with col1:
+            aportacion_voluntaria = st.number_input("Aportación voluntaria mensual ($)", 0, 10000, 1000,
+                                                    key="aportacion_cambio_fondo")
+        with col2:
+            tasa_crecimiento = st.slider("Tasa de crecimiento salarial anual estimada (%)", 0.0, 10.0, 3.5,
+                                         key="tasa_cambio_fondo")
         submitted = st.form_submit_button("Simular Cambio")
     
     if submitted:
@@ -317,13 +448,38 @@ elif menu == "Agentes de Gestión de Inversiones":
         st.write(f"- Comisión anual: {fondo_info['comision']}%")
         st.write(f"- Perfil recomendado: {fondo_info['perfil_recomendado']}")
         
-        afiliado = df_afiliados[df_afiliados['id'] == afiliado_id].iloc[0]
-        años_restantes = 65 - afiliado['edad']
+        afiliado = indice.afiliado(afiliado_id)
+        argumentos = (int(afiliado['edad']), float(afiliado['salario']), int(afiliado['años_cotizacion']),
+                      aportacion_voluntaria, tasa_crecimiento, int(afiliado['edad_jubilacion']))
+        # Rendimiento neto de comisión de cada fondo; la proyección es la fórmula exacta de `proyeccion`
+        neto = montecarlo.parametros_fondos(df_fondos)['rendimiento_neto']
+        if str(fondo_actual) not in neto.index:
+            st.error(f"El fondo actual {fondo_actual} no existe en el catálogo de fondos.")
+            st.stop()
+        pension_actual, pension_nueva = (
+            float(proyeccion.pension_con_rendimiento(*argumentos, neto[fondo]))
+            for fondo in (str(fondo_actual), nuevo_fondo))
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric(f"Pensión con {fondo_actual} ({neto[str(fondo_actual)]:.1f}% neto)",
+                      f"${pension_actual:,.2f}")
+        with col2:
+            st.metric(f"Pensión con {nuevo_fondo} ({neto[nuevo_fondo]:.1f}% neto)", f"${pension_nueva:,.2f}",
+                      f"{(pension_nueva - pension_actual) / pension_actual * 100:+.1f}%" if pension_actual else None)
+
+        edades = np.arange(argumentos[0], max(argumentos[0], argumentos[-1]) + 1)
+        curvas = pd.DataFrame({fondo: proyeccion.pension_con_rendimiento(*argumentos[:-1], edades, neto[fondo])
+                               for fondo in dict.fromkeys([str(fondo_actual), nuevo_fondo])})
+        curvas['edad'] = edades
+        fig = px.line(curvas, x='edad', y=[c for c in curvas.columns if c != 'edad'],
+                      title=f"Pensión proyectada de {afiliado['nombre']}: fondo actual vs. nuevo",
+                      labels={'edad': 'Edad', 'value': 'Pensión mensual proyectada ($)', 'variable': 'Fondo'})
+        graficas.mostrar(fig, "Cambio de fondo")
+
+        advertencia = str(nucleo.advertencias_cambio_fondo(afiliado['edad'], nuevo_fondo))
         
-        if años_restantes < 10 and nuevo_fondo == 'Crecimiento':
-            st.warning(" ▲ Este fondo puede no ser adecuado para perfiles cercanos a la jubilación")
-        elif años_restantes > 20 and nuevo_fondo == 'Conservador':
-            st.warning(" ▲ Este fondo puede ofrecer rendimientos insuficientes para horizontes largos")
+        if advertencia:
+            st.warning(f" ▲ {advertencia}")
 
 elif menu == "Agentes de Análisis de Comportamiento":
     st.header("Agentes de Análisis de Comportamiento de los Afiliados")
@@ -335,32 +491,42 @@ elif menu == "Agentes de Análisis de Comportamiento":
     """)
     
     st.subheader("Patrones de Aportaciones Voluntarias")
-    transacciones_analisis = df_transacciones.merge(df_afiliados[['id', 'nombre', 'edad', 'salario']],
-                                                  left_on='id_afiliado', right_on='id')
-    fig = px.scatter(transacciones_analisis, x='salario', y='monto', color='edad',
-                    title="Relación entre Salario y Aportaciones Voluntarias",
-                    labels={'salario': 'Salario ($)', 'monto': 'Aportación ($)', 'edad': 'Edad'})
-    st.plotly_chart(fig, use_container_width=True)
+    fig = graficas.dispersion(datos('transacciones_analisis'), x='salario', y='monto', color='edad',
+                              title="Relación entre Salario y Aportaciones Voluntarias",
+                              labels={'salario': 'Salario ($)', 'monto': 'Aportación ($)', 'edad': 'Edad'})
+    graficas.mostrar(fig, "Salario vs aportaciones")
     
     st.subheader("Frecuencia de Aportaciones por Afiliado")
-    frecuencia_aportaciones = transacciones_analisis.groupby(['id_afiliado', 'nombre']).size().reset_index(name='aportaciones')
-    fig = px.bar(frecuencia_aportaciones, x='nombre', y='aportaciones',
-                title="Número de Aportaciones por Afiliado",
-                labels={'aportaciones': 'Número de aportaciones', 'nombre': 'Afiliado'})
-    st.plotly_chart(fig, use_container_width=True)
+    fig = graficas.barras_principales(datos('frecuencia_aportaciones'), x='nombre', y='aportaciones',
+                                      title="Número de Aportaciones por Afiliado",
+                                      labels={'aportaciones': 'Número de aportaciones', 'nombre': 'Afiliado'})
+    graficas.mostrar(fig, "Aportaciones por afiliado")
     
+    st.subheader("Frecuencia de Aportaciones por Edad y Salario")
+    col1, col2 = st.columns(2)
+    with col1:
+        fig = px.bar(datos('frecuencia_edad'), x='banda_edad', y='aportaciones_12m',
+                     title="Aportaciones promedio (12 meses) por edad",
+                     labels={'banda_edad': 'Edad', 'aportaciones_12m': 'Aportaciones'})
+        graficas.mostrar(fig, "Frecuencia por edad")
+    with col2:
+        fig = px.bar(datos('frecuencia_salario'), x='banda_salario', y='aportaciones_12m',
+                     title="Aportaciones promedio (12 meses) por salario",
+                     labels={'banda_salario': 'Salario', 'aportaciones_12m': 'Aportaciones'})
+        graficas.mostrar(fig, "Frecuencia por salario")
+
+    st.subheader("Riesgo de Deserción")
+    caracteristicas = datos('comportamiento')
+    st.dataframe(caracteristicas.nlargest(20, 'riesgo_desercion')[
+        ['id', 'nombre', 'edad', 'aportaciones_6m', 'dias_sin_aportar', 'racha_inactiva_max', 'tendencia',
+         'riesgo_desercion', 'nivel_desercion']])
+
     st.subheader("Recomendaciones de Comportamiento")
-    st.markdown("""
-    **Hallazgos del agente de análisis:**
-    - Los afiliados con mayores salarios tienden a realizar aportaciones más consistentes
-    - Los afiliados mayores de 50 años muestran menor frecuencia de aportaciones voluntarias
-    - Se detectaron 3 afiliados sin aportaciones voluntarias en los últimos 6 meses
-    
-    **Recomendaciones:**
-    1. Implementar campaña de concientización para afiliados mayores de 50 años
-    2. Crear programa de recordatorios automatizados para aportaciones
-    3. Contactar a afiliados inactivos en aportaciones voluntarias
-    """)
+    hallazgos, recomendaciones = datos('hallazgos_comportamiento')
+    st.markdown("**Hallazgos del agente de análisis:**\n" + "\n".join(f"- {texto}" for texto in hallazgos))
+    if recomendaciones:
+        st.markdown("**Recomendaciones:**\n" + "\n".join(f"{i}. {texto}"
+                                                           for i, texto in enumerate(recomendaciones, 1)))
 
 
 #################################
@@ -375,18 +541,16 @@ elif menu == "Agentes de Supervisión de Riesgos":
     """)
     
     st.subheader("Alertas de Riesgo Detectadas")
-    alertas = [
-        {"tipo": "Pensión insuficiente", "afiliados": 3, "severidad": "Alta"},
-        {"tipo": "Fondo inadecuado para edad", "afiliados": 2, "severidad": "Media"},
-        {"tipo": "Sin aportaciones recientes", "afiliados": 4, "severidad": "Baja"},
-        {"tipo": "Cambios bruscos en salario", "afiliados": 1, "severidad": "Media"}
-    ]
-    df_alertas = pd.DataFrame(alertas)
+    df_afiliados = datos('afiliados_completos')
+    alertas = datos('alertas')
+    df_alertas = alertas.drop(columns='mapa_bits')
     st.dataframe(df_alertas)
     
     st.subheader("Afiliados con Mayor Riesgo")
     df_riesgo = df_afiliados[df_afiliados['riesgo_pension_insuficiente'] == 'Alto'][['id', 'nombre', 'edad', 'pension_proyectada_base']]
-    st.dataframe(df_riesgo)
+    tabla.tabla_paginada(construir_tabla(df_riesgo, 'riesgo_alto', version_datos,
+                                         ('id', 'nombre', 'edad', 'pension_proyectada_base')),
+                         'riesgo_alto', filtros=('nombre',))
     
     st.subheader("Simulación de Pruebas de Cumplimiento")
     with st.form("prueba_cumplimiento"):
@@ -397,54 +561,81 @@ elif menu == "Agentes de Supervisión de Riesgos":
         ])
         submitted = st.form_submit_button("Ejecutar Prueba")
     
+    # La prueba ejecutada se conserva en la sesión para poder paginar sus resultados
     if submitted:
+        st.session_state['prueba_ejecutada'] = prueba
+    prueba = st.session_state.get('prueba_ejecutada')
+    
+    if prueba:
         if prueba == "Verificación de fondos adecuados por edad":
             # Afiliados mayores de 55 en fondos de crecimiento (riesgo alto)
             # O menores de 40 en fondos conservadores (oportunidad perdida)
-            inadecuados = df_afiliados[
-                ((df_afiliados['edad'] > 55) & (df_afiliados['fondo_actual'] == 'Crecimiento')) |
-                ((df_afiliados['edad'] < 40) & (df_afiliados['fondo_actual'] == 'Conservador'))
-            ]
+            inadecuados = df_afiliados.iloc[cumplimiento.posiciones_marcadas(alertas, "Fondo inadecuado para edad",
+                                                                            len(df_afiliados))]
             
             if not inadecuados.empty:
                 st.warning(f"Se encontraron {len(inadecuados)} afiliados con fondos potencialmente inadecuados para su edad")
-                st.dataframe(inadecuados[['id', 'nombre', 'edad', 'fondo_actual', 'riesgo_pension_insuficiente']])
+                tabla.tabla_paginada(construir_tabla(inadecuados, 'inadecuados', version_datos, ('id', 'nombre', 'edad')),
+                                     'inadecuados', filtros=('nombre',),
+                                     columnas=['id', 'nombre', 'edad', 'fondo_actual', 'riesgo_pension_insuficiente'])
             else:
                 st.success("Todos los afiliados tienen fondos adecuados para su edad")
         
         elif prueba == "Detección de pensiones insuficientes":
             # Pensiones proyectadas menores al 40% del salario actual
-            insuficientes = df_afiliados[
-                df_afiliados['pension_proyectada_base'] < (df_afiliados['salario'] * 0.4)
-            ]
+            insuficientes = df_afiliados.iloc[cumplimiento.posiciones_marcadas(alertas, "Pensión insuficiente",
+                                                                              len(df_afiliados))]
             
             if not insuficientes.empty:
                 st.warning(f"Se encontraron {len(insuficientes)} afiliados con pensiones proyectadas insuficientes")
                 # Mostrar columna adicional con el porcentaje pensión/salario
                 insuficientes['%_pension_salario'] = (insuficientes['pension_proyectada_base'] / insuficientes['salario'] * 100).round(1)
-                st.dataframe(insuficientes[['id', 'nombre', 'salario', 'pension_proyectada_base', '%_pension_salario', 'recomendacion_aportacion']])
+                tabla.tabla_paginada(construir_tabla(insuficientes, 'insuficientes', version_datos,
+                                                     ('id', 'nombre', 'salario', '%_pension_salario')),
+                                     'insuficientes', filtros=('nombre',),
+                                     columnas=['id', 'nombre', 'salario', 'pension_proyectada_base', '%_pension_salario', 'recomendacion_aportacion'])
             else:
                 st.success("No se detectaron pensiones insuficientes en los registros actuales")
         
         elif prueba == "Identificación de aportaciones atípicas":
-            # Calcular estadísticas de aportaciones
-            stats_aportaciones = df_transacciones.groupby('id_afiliado')['monto'].agg(['mean', 'std']).reset_index()
+            # Identificar transacciones atípicas (monto > media + 2*std) en dos pasadas por lotes
+            aportaciones_atipicas = datos('atipicas')
             
-            # Unir con datos de afiliados
-            transacciones_analisis = df_transacciones.merge(stats_aportaciones, on='id_afiliado')
-            transacciones_analisis = transacciones_analisis.merge(df_afiliados[['id', 'nombre']], left_on='id_afiliado', right_on='id')
-            
-            # Identificar transacciones atípicas (monto > media + 2*std)
-            transacciones_analisis['atipica'] = transacciones_analisis['monto'] > (transacciones_analisis['mean'] + 2 * transacciones_analisis['std'])
-            atipicas = transacciones_analisis[transacciones_analisis['atipica']]
-            
-            if not atipicas.empty:
-                st.warning(f"Se detectaron {len(atipicas)} aportaciones atípicas")
-                st.dataframe(atipicas[['nombre', 'fecha', 'monto', 'mean', 'std']].rename(
-                    columns={'mean': 'Promedio', 'std': 'Desviación', 'monto': 'Monto'}))
+            if not aportaciones_atipicas.empty:
+                # Unir con datos de afiliados sólo las aportaciones marcadas
+                aportaciones_atipicas = aportaciones_atipicas.merge(df_afiliados[['id', 'nombre']], left_on='id_afiliado', right_on='id')
+                st.warning(f"Se detectaron {len(aportaciones_atipicas)} aportaciones atípicas")
+                aportaciones_atipicas = aportaciones_atipicas.rename(columns={'mean': 'Promedio', 'std': 'Desviación', 'monto': 'Monto'})
+                tabla.tabla_paginada(construir_tabla(aportaciones_atipicas, 'atipicas', version_datos, ('Monto', 'fecha', 'nombre')),
+                                     'atipicas', filtros=('nombre',),
+                                     columnas=['nombre', 'fecha', 'Monto', 'Promedio', 'Desviación'])
             else:
                 st.success("No se detectaron aportaciones atípicas en los registros actuales")
 
+elif menu == PAGINA_RENDIMIENTO:
+    st.header("Rendimiento por Etapa")
+    st.markdown("Latencias de las últimas ejecuciones de todas las sesiones de este proceso.")
+    st.dataframe(instrumentacion.resumen().sort_values('p95_ms', ascending=False))
+
+    st.subheader("Tasa de Aciertos de Caches")
+    st.dataframe(instrumentacion.resumen_caches())
+
+    st.subheader("Tablas Derivadas en Memoria")
+    st.dataframe(grafo.memoria())
+
+    if instrumentacion.ARCHIVO_TRAZAS:
+        st.caption(f"Las trazas por ejecución se escriben en {instrumentacion.ARCHIVO_TRAZAS}")
+    else:
+        st.caption("Defina PENSIONISSSTE_TRAZAS para escribir las trazas por ejecución a un archivo JSON.")
+    if st.button("Reiniciar mediciones"):
+        instrumentacion.reiniciar()
+
+# Carga útil de las gráficas de esta ejecución
+with st.sidebar.expander("Carga útil de gráficas"):
+    st.dataframe(graficas.reporte_graficas())
+
 # Pie de página
 st.markdown("---")
 st.markdown("**AFORE PENSIONISSSTE** - Sistema Integral de Agentes Inteligentes - © 2025")
+
+instrumentacion.terminar_traza()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Detección en streaming de aportaciones atípicas (monto > media + 2*desviación).
+
+La primera pasada acumula por afiliado el conteo, la media y la suma de
+cuadrados de las desviaciones (Welford, combinando bloques con la fórmula de
+Chan); la segunda marca las aportaciones que superan el umbral. La memoria
+depende del número de afiliados y del tamaño de lote, no del número de
+transacciones.
+
+Uso en lote:
+    python atipicas.py --salida aportaciones_atipicas.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import almacen
+
+
+COLUMNAS = ['id_afiliado', 'fecha', 'monto']
+DESVIACIONES = 2
+
+
+class AcumuladorAportaciones:
+    """Media y varianza por afiliado actualizadas bloque a bloque en una sola pasada."""
+
+    def __init__(self):
+        self.n = np.zeros(0, dtype=np.int64)
+        self.media = np.zeros(0)
+        self.m2 = np.zeros(0)
+
+    def _crecer(self, tamaño):
+        if tamaño > len(self.n):
+            extra = tamaño - len(self.n)
+            self.n = np.concatenate([self.n, np.zeros(extra, dtype=np.int64)])
+            self.media = np.concatenate([self.media, np.zeros(extra)])
+            self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+
+    def actualizar(self, ids, montos):
+        """Incorpora un bloque de aportaciones (`ids` enteros no negativos)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        montos = np.asarray(montos, dtype=float)
+        if not len(ids):
+            return
+        self._crecer(ids.max() + 1)
+        tamaño = len(self.n)
+
+        n_bloque = np.bincount(ids, minlength=tamaño)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            media_bloque = np.bincount(ids, montos, minlength=tamaño) / n_bloque
+        m2_bloque = np.bincount(ids, (montos - media_bloque[ids]) ** 2, minlength=tamaño)
+
+        presentes = n_bloque > 0
+        n_a, n_b = self.n[presentes], n_bloque[presentes]
+        n_total = n_a + n_b
+        delta = media_bloque[presentes] - self.media[presentes]
+        self.media[presentes] += delta * n_b / n_total
+        self.m2[presentes] += m2_bloque[presentes] + delta ** 2 * n_a * n_b / n_total
+        self.n[presentes] = n_total
+
+    def desviacion(self):
+        """Desviación estándar muestral por afiliado (NaN con menos de dos aportaciones)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.n > 1, np.sqrt(self.m2 / (self.n - 1)), np.nan)
+
+    def estadisticas(self):
+        """Tabla id_afiliado, n, mean, std de los afiliados con aportaciones."""
+        ids = np.flatnonzero(self.n)
+        return pd.DataFrame({'id_afiliado': ids, 'n': self.n[ids], 'mean': self.media[ids],
+                             'std': self.desviacion()[ids]})
+
+
+def acumular(lotes):
+    """Primera pasada: estadísticas por afiliado sobre un iterable de bloques."""
+    acumulador = AcumuladorAportaciones()
+    for bloque in lotes:
+        acumulador.actualizar(bloque['id_afiliado'].to_numpy(), bloque['monto'].to_numpy())
+    return acumulador
+
+
+def marcar_atipicas(lotes, acumulador, desviaciones=DESVIACIONES):
+    """Segunda pasada: genera, por bloque, las aportaciones por encima del umbral."""
+    desviacion = acumulador.desviacion()
+    for bloque in lotes:
+        ids = bloque['id_afiliado'].to_numpy()
+        media, std = acumulador.media[ids], desviacion[ids]
+        atipica = bloque['monto'].to_numpy() > media + desviaciones * std
+        if atipica.any():
+            yield bloque[atipica].assign(mean=media[atipica], std=std[atipica])
+
+
+def detectar_atipicas(tamaño_lote=almacen.FILAS_POR_GRUPO, desviaciones=DESVIACIONES):
+    """Aportaciones atípicas del almacén de transacciones, en dos pasadas por lotes."""
+    def lotes():
+        return almacen.iterar_lotes('transacciones', columnas=COLUMNAS, tamaño_lote=tamaño_lote)
+
+    acumulador = acumular(lotes())
+    partes = list(marcar_atipicas(lotes(), acumulador, desviaciones))
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS + ['mean', 'std'])
+    return pd.concat(partes, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta aportaciones atípicas en el historial completo.")
+    parser.add_argument('--salida', default='aportaciones_atipicas.csv')
+    parser.add_argument('--tamaño-lote', type=int, default=almacen.FILAS_POR_GRUPO)
+    parser.add_argument('--desviaciones', type=float, default=DESVIACIONES)
+    args = parser.parse_args()
+
+    almacen.asegurar_almacen()
+    atipicas = detectar_atipicas(args.tamaño_lote, args.desviaciones)
+    atipicas.to_csv(args.salida, index=False)
+    print(f"{len(atipicas):,} aportaciones atípicas escritas en {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: arranque en frío leyendo los CSV vs. el almacén Parquet.
+
+Genera CSV sintéticos (``sintetico.py``) en un directorio temporal y mide,
+en un proceso nuevo para cada ruta, el tiempo de carga y la memoria residente
+máxima (RSS).
+
+Uso:
+    python benchmarks/bench_almacen.py --afiliados 1000000 --transacciones-por-afiliado 10
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import sintetico
+
+
+def cargar_csv():
+    afiliados = pd.read_csv('afiliados.csv')
+    proyecciones = pd.read_csv('proyecciones_pensiones.csv')
+    pd.read_csv('fondos_inversion.csv')
+    transacciones = pd.read_csv('transacciones.csv')
+    transacciones['fecha'] = pd.to_datetime(transacciones['fecha'], dayfirst=True)
+    pd.merge(afiliados, proyecciones, on='id')
+
+
+def cargar_almacen():
+    import almacen
+    afiliados = almacen.cargar_tabla('afiliados')
+    proyecciones = almacen.cargar_tabla('proyecciones')
+    almacen.cargar_tabla('fondos')
+    almacen.cargar_tabla('transacciones', columnas=['id_afiliado', 'fecha', 'monto'])
+    pd.merge(afiliados, proyecciones, on='id')
+
+
+def medir(ruta):
+    """Ejecuta una ruta de carga en este proceso e imprime tiempo y RSS máximo."""
+    inicio = time.perf_counter()
+    if ruta == 'csv':
+        cargar_csv()
+    elif ruta == 'parquet':
+        cargar_almacen()
+    elif ruta == 'conversion':
+        import almacen
+        almacen.asegurar_almacen()
+    segundos = time.perf_counter() - inicio
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'ruta': ruta, 'segundos': round(segundos, 3), 'rss_max_mb': round(rss_mb, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--afiliados', type=int, default=100_000)
+    parser.add_argument('--transacciones-por-afiliado', type=int, default=10)
+    parser.add_argument('--medir', choices=['csv', 'parquet', 'conversion'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.medir)
+        return
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        sintetico.generar(args.afiliados, args.transacciones_por_afiliado, formatos=('csv',))
+        print(f"Afiliados: {args.afiliados:,}  Transacciones: {args.afiliados * args.transacciones_por_afiliado:,}")
+        for ruta in ['csv', 'conversion', 'parquet']:
+            salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir', ruta],
+                                    capture_output=True, text=True, check=True,
+                                    env={**os.environ, 'PYTHONPATH': RAIZ})
+            resultado = json.loads(salida.stdout)
+            print(f"{ruta:<12} {resultado['segundos']:>9.3f} s  {resultado['rss_max_mb']:>9.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: lectura de transacciones.csv con inferencia de fechas vs. esquema.
+
+Genera un transacciones.csv sintético (fechas '%d/%m/%Y') y mide el
+rendimiento en filas/s de tres rutas de lectura por bloques:
+
+- inferencia: ``pd.read_csv`` y ``pd.to_datetime(dayfirst=True)`` sin
+  formato, la ruta anterior del almacén
+- formato_fijo: ``pd.read_csv`` y ``pd.to_datetime`` con formato explícito
+- esquema: ``esquema.leer_csv`` (lector de pyarrow, tipos declarados y
+  validación de filas)
+
+Uso:
+    python benchmarks/bench_esquema.py --filas 50000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import esquema
+import sintetico
+
+
+FILAS_POR_BLOQUE = 1_000_000
+
+
+def leer_inferencia(ruta):
+    filas = 0
+    for bloque in pd.read_csv(ruta, chunksize=FILAS_POR_BLOQUE):
+        bloque['fecha'] = pd.to_datetime(bloque['fecha'], dayfirst=True)
+        filas += len(bloque)
+    return filas
+
+
+def leer_formato_fijo(ruta):
+    filas = 0
+    for bloque in pd.read_csv(ruta, chunksize=FILAS_POR_BLOQUE):
+        bloque['fecha'] = pd.to_datetime(bloque['fecha'], format=esquema.FORMATO_FECHA)
+        filas += len(bloque)
+    return filas
+
+
+def leer_esquema(ruta):
+    filas = 0
+    for lote, _ in esquema.leer_csv(ruta, 'transacciones'):
+        lote.to_pandas()
+        filas += len(lote)
+    return filas
+
+
+RUTAS = {'inferencia': leer_inferencia, 'formato_fijo': leer_formato_fijo, 'esquema': leer_esquema}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--filas', type=int, default=5_000_000, help="Transacciones aproximadas a generar")
+    parser.add_argument('--rutas', nargs='+', choices=list(RUTAS), default=list(RUTAS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        sintetico.generar(max(args.filas // 10, 1), 10, formatos=('csv',))
+        ruta = 'transacciones.csv'
+        print(f"{ruta}: {os.path.getsize(ruta) / 2**20:,.0f} MB")
+        print(f"{'ruta':<14} {'filas':>12} {'segundos':>9} {'filas/s':>12}")
+        for nombre in args.rutas:
+            inicio = time.perf_counter()
+            filas = RUTAS[nombre](ruta)
+            segundos = time.perf_counter() - inicio
+            print(f"{nombre:<14} {filas:>12,} {segundos:>9.2f} {filas / segundos:>12,.0f}")
+        os.chdir(RAIZ)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: latencia por clic al consultar un afiliado.
+
+Compara el filtro booleano sobre la tabla completa con `IndiceAfiliados`
+para cada tamaño indicado (filas de afiliados y de transacciones).
+
+Uso:
+    python benchmarks/bench_indices.py --tamaños 1000000 10000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sintetico
+from indices import IndiceAfiliados
+
+
+def generar(n, semilla=0):
+    afiliados, _, transacciones = next(sintetico.generar_bloques(n, por_afiliado=1, semilla=semilla,
+                                                                 filas_por_bloque=n))
+    afiliados = afiliados[['id', 'edad', 'fondo_actual']].astype({'fondo_actual': 'category'})
+    return afiliados, transacciones[['id_afiliado', 'fecha', 'monto']]
+
+
+def cronometrar(funcion, ids):
+    inicio = time.perf_counter()
+    for id_afiliado in ids:
+        funcion(id_afiliado)
+    return (time.perf_counter() - inicio) / len(ids) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tamaños', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--consultas', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'filas':>12} {'construcción (s)':>17} {'filtro (ms)':>12} {'índice (ms)':>12}")
+    for n in args.tamaños:
+        afiliados, transacciones = generar(n)
+        ids = np.random.default_rng(1).integers(1, n + 1, args.consultas)
+
+        inicio = time.perf_counter()
+        indice = IndiceAfiliados(afiliados, transacciones)
+        construccion = time.perf_counter() - inicio
+
+        def por_filtro(id_afiliado):
+            afiliados[afiliados['id'] == id_afiliado].iloc[0]
+            transacciones[transacciones['id_afiliado'] == id_afiliado]
+
+        def por_indice(id_afiliado):
+            indice.afiliado(id_afiliado)
+            indice.transacciones_de(id_afiliado)
+
+        print(f"{n:>12,} {construccion:>17.3f} {cronometrar(por_filtro, ids):>12.3f} "
+              f"{cronometrar(por_indice, ids):>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
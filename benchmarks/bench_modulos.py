@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: curvas de escalamiento de la ruta de datos de cada módulo.
+
+Para cada tamaño genera un conjunto sintético (``sintetico.py``) en un
+directorio temporal y ejecuta, con los mismos pasos que la aplicación, la
+carga y la preparación de datos y gráficas de cada módulo: uniones,
+agrupaciones, filtros e índices. Cada etapa se mide dos veces: una para el
+tiempo y otra con tracemalloc para el pico de memoria que asigna. Al final
+imprime el exponente de crecimiento entre tamaños consecutivos (1 = lineal),
+donde una regresión aparece como un salto en la curva.
+
+Uso:
+    python benchmarks/bench_modulos.py --tamaños 1000 10000 100000 1000000 --salida curvas.csv
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import almacen
+import cumplimiento
+import graficas
+import ingesta
+import nucleo
+import sintetico
+from indices import IndiceAfiliados
+from tabla import TablaOrdenable
+
+
+def carga_csv(datos):
+    afiliados = pd.read_csv('afiliados.csv')
+    proyecciones = pd.read_csv('proyecciones_pensiones.csv')
+    pd.read_csv('fondos_inversion.csv')
+    transacciones = pd.read_csv('transacciones.csv')
+    transacciones['fecha'] = pd.to_datetime(transacciones['fecha'], dayfirst=True)
+    pd.merge(afiliados, proyecciones, on='id')
+
+
+def carga_almacen(datos):
+    afiliados = almacen.cargar_tabla('afiliados')
+    proyecciones = almacen.cargar_tabla('proyecciones')
+    datos['fondos'] = almacen.cargar_tabla('fondos')
+    datos['transacciones'] = almacen.cargar_tabla('transacciones', columnas=['id_afiliado', 'fecha', 'monto'])
+    datos['afiliados'] = pd.merge(afiliados, proyecciones, on='id')
+
+
+def dashboard(datos):
+    afiliados = datos['afiliados']
+    afiliados['pension_proyectada_base'].mean()
+    (afiliados['riesgo_pension_insuficiente'] == 'Alto').sum()
+    graficas.histograma(afiliados['pension_proyectada_base'], nbins=10, title="", label="")
+    graficas.pastel(afiliados['fondo_actual'].value_counts(), title="")
+    TablaOrdenable(afiliados, ('id', 'nombre', 'edad', 'salario')).pagina('salario', descendente=True)
+
+
+def asesoria(datos):
+    indice = IndiceAfiliados(datos['afiliados'], datos['transacciones'])
+    for id_afiliado in np.random.default_rng(0).integers(1, len(datos['afiliados']) + 1, 100):
+        indice.afiliado(id_afiliado)
+        historial = indice.transacciones_de(id_afiliado)
+    graficas.barras_por_fecha(historial, x='fecha', y='monto', title="", labels={})
+
+
+def inversiones(datos):
+    afiliados = datos['afiliados']
+    graficas.pastel(afiliados['fondo_actual'].value_counts(), title="")
+    nucleo.simular_cambios_fondo(afiliados, datos['fondos'], 'Conservador')
+
+
+def comportamiento(datos):
+    afiliados = datos['afiliados']
+    transacciones = datos['transacciones'].merge(afiliados[['id', 'nombre', 'edad', 'salario']],
+                                                 left_on='id_afiliado', right_on='id')
+    graficas.dispersion(transacciones, x='salario', y='monto', color='edad', title="", labels={})
+    frecuencia = ingesta.reconstruir_agregados().merge(afiliados[['id', 'nombre']],
+                                                       left_on='id_afiliado', right_on='id')
+    graficas.barras_principales(frecuencia, x='nombre', y='n', title="", labels={})
+
+
+def riesgos(datos):
+    afiliados = datos['afiliados']
+    alertas = cumplimiento.materializar()
+    afiliados.iloc[cumplimiento.posiciones_marcadas(alertas, "Pensión insuficiente", len(afiliados))]
+    afiliados[afiliados['riesgo_pension_insuficiente'] == 'Alto'][['id', 'nombre', 'edad']]
+
+
+ETAPAS = {
+    'carga_csv': carga_csv,
+    'carga_almacen': carga_almacen,
+    'dashboard': dashboard,
+    'asesoria': asesoria,
+    'inversiones': inversiones,
+    'comportamiento': comportamiento,
+    'riesgos': riesgos,
+}
+
+
+def medir(etapa, datos):
+    """
+    Pico de memoria (MB) asignado en una ejecución bajo tracemalloc y segundos de otra.
+
+    La primera ejecución también sirve de calentamiento. tracemalloc sólo ve
+    las asignaciones de Python, NumPy y pandas; no las de los buffers de Arrow.
+    """
+    tracemalloc.start()
+    etapa(datos)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    inicio = time.perf_counter()
+    etapa(datos)
+    return time.perf_counter() - inicio, pico / 2**20
+
+
+def exponentes(resultados):
+    """Pendiente log-log del tiempo entre tamaños consecutivos, por etapa."""
+    resultados = resultados.sort_values(['etapa', 'afiliados'])
+    pendiente = (np.log(resultados.groupby('etapa')['segundos'].shift(-1) / resultados['segundos']) /
+                 np.log(resultados.groupby('etapa')['afiliados'].shift(-1) / resultados['afiliados']))
+    return resultados.assign(exponente=pendiente).pivot(index='etapa', columns='afiliados', values='exponente')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tamaños', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--transacciones-por-afiliado', type=float, default=10)
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument('--salida', help="CSV donde guardar las curvas (afiliados, etapa, segundos, memoria_mb)")
+    args = parser.parse_args()
+
+    etapas = ['carga_almacen'] + [e for e in args.etapas if e != 'carga_almacen']
+    filas = []
+    origen = os.getcwd()
+    print(f"{'afiliados':>11} {'etapa':<15} {'segundos':>9} {'memoria (MB)':>13}")
+    for n in args.tamaños:
+        with tempfile.TemporaryDirectory() as directorio:
+            os.chdir(directorio)
+            sintetico.generar(n, args.transacciones_por_afiliado)
+            datos = {}
+            for nombre in etapas:
+                segundos, memoria = medir(ETAPAS[nombre], datos)
+                filas.append({'afiliados': n, 'etapa': nombre, 'segundos': segundos, 'memoria_mb': memoria})
+                print(f"{n:>11,} {nombre:<15} {segundos:>9.3f} {memoria:>13.1f}")
+            os.chdir(origen)
+
+    resultados = pd.DataFrame(filas)
+    if args.salida:
+        resultados.to_csv(args.salida, index=False)
+    if len(args.tamaños) > 1:
+        print("\nExponente de crecimiento del tiempo entre tamaños consecutivos (1 = lineal):")
+        print(exponentes(resultados).dropna(axis=1, how='all').round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
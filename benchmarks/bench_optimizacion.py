@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tiempo de solución del agente de optimización de fondos.
+
+Genera afiliados y proyecciones sintéticos (``sintetico.py``) en memoria y
+mide, para cada tamaño, la solución en frío (sin solución previa), la corrida
+en caliente sin cambios y la corrida en caliente con `--cambios` de los
+afiliados modificados (salario y edad), como la ejecución nocturna tras un
+día de movimientos.
+
+Uso:
+    python benchmarks/bench_optimizacion.py --tamaños 100000 1000000 5000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import optimizacion
+import sintetico
+
+
+def generar_datos(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    afiliados = sintetico.generar_afiliados(rng, np.arange(1, n + 1))
+    proyecciones = sintetico.generar_proyecciones(rng, afiliados)
+    datos = afiliados[['id', 'edad', 'salario', 'años_cotizacion', 'fondo_actual']].merge(
+        proyecciones[['id', 'edad_jubilacion', 'pension_proyectada_base']], on='id')
+    datos['fondo_actual'] = datos['fondo_actual'].astype('category')
+    datos['aportacion'] = rng.choice([0, 500, 1000, 2000], size=n, p=[0.4, 0.3, 0.2, 0.1])
+    return datos
+
+
+def modificar(datos, fraccion, semilla=1):
+    """Copia de `datos` con `fraccion` de los afiliados con nuevo salario y un año más de edad."""
+    rng = np.random.default_rng(semilla)
+    cambiados = datos.copy()
+    filas = rng.choice(len(datos), size=int(len(datos) * fraccion), replace=False)
+    cambiados.loc[filas, 'salario'] = (cambiados.loc[filas, 'salario'] * 1.05).round()
+    cambiados.loc[filas, 'edad'] += 1
+    return cambiados
+
+
+def cronometrar(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    valor = funcion(*args, **kwargs)
+    return valor, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tamaños', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--cambios', type=float, default=0.01, help="Fracción de afiliados modificados")
+    args = parser.parse_args()
+
+    fondos = sintetico.FONDOS
+    print(f"{'afiliados':>10} {'frío (s)':>9} {'sin cambios (s)':>16} {'con cambios (s)':>16} "
+          f"{'recalculados':>13} {'cambian de fondo':>17}")
+    for n in args.tamaños:
+        datos = generar_datos(n)
+        solucion, frio = cronometrar(optimizacion.optimizar, datos, fondos)
+        _, sin_cambios = cronometrar(optimizacion.optimizar, datos, fondos, solucion)
+        nueva, con_cambios = cronometrar(optimizacion.optimizar, modificar(datos, args.cambios), fondos, solucion)
+        print(f"{n:>10,} {frio:>9.2f} {sin_cambios:>16.2f} {con_cambios:>16.2f} "
+              f"{int(nueva['recalculado'].sum()):>13,} {int((nueva['mezcla'] != solucion['mezcla']).sum()):>17,}")
+
+
+if __name__ == '__main__':
+    main()
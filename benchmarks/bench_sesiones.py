@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: memoria por sesión con copias por sesión vs. tablas compartidas.
+
+Simula `--sesiones` sesiones concurrentes que retienen afiliados (unidos con
+proyecciones) y transacciones. En modo 'copia' cada sesión recibe su propia
+copia, como hace ``st.cache_data`` al deserializar el valor cacheado; en modo
+'compartido' cada sesión abre las tablas mapeadas de `compartido`. Cada modo
+corre en un proceso nuevo y reporta RSS y PSS (la memoria compartida se
+reparte entre los procesos que la mapean); el costo por sesión se mide con la
+PSS. Después repite la carga en `--procesos` procesos simultáneos, como los
+workers de gunicorn.
+
+Uso:
+    python benchmarks/bench_sesiones.py --afiliados 200000 --sesiones 50 --procesos 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import almacen
+import compartido
+import sintetico
+
+
+def memoria_mb():
+    """RSS y PSS del proceso actual en MB (Linux)."""
+    with open('/proc/self/status') as archivo:
+        rss = next(int(linea.split()[1]) for linea in archivo if linea.startswith('VmRSS'))
+    with open('/proc/self/smaps_rollup') as archivo:
+        pss = next(int(linea.split()[1]) for linea in archivo if linea.startswith('Pss:'))
+    return rss / 1024, pss / 1024
+
+
+def preparar(version):
+    """Exporta las tablas compartidas que usan las sesiones."""
+    afiliados = pd.merge(almacen.cargar_tabla('afiliados'), almacen.cargar_tabla('proyecciones'), on='id')
+    compartido.exportar('afiliados_completos', afiliados, version)
+    transacciones = almacen.cargar_tabla('transacciones', columnas=['id_afiliado', 'fecha', 'monto'])
+    compartido.exportar('transacciones', transacciones, version)
+
+
+def abrir_sesion(modo, version, base=None):
+    if modo == 'copia':
+        return [tabla.copy(deep=True) for tabla in base]
+    return [compartido.abrir('afiliados_completos', version), compartido.abrir('transacciones', version)]
+
+
+def recorrer(tablas):
+    """Lee todas las columnas, como lo harían las páginas al filtrar y graficar."""
+    for tabla in tablas:
+        for columna in tabla:
+            tabla[columna].iloc[::max(1, len(tabla) // 1000)].tolist()
+            if tabla[columna].dtype.kind in 'ifM':
+                tabla[columna].max()
+
+
+def medir_sesiones(modo, sesiones):
+    version = almacen.version_datos()
+    base = None
+    if modo == 'copia':
+        base = [compartido.abrir('afiliados_completos', version).copy(deep=True),
+                compartido.abrir('transacciones', version).copy(deep=True)]
+    inicial = memoria_mb()
+    abiertas = []
+    for _ in range(sesiones):
+        abiertas.append(abrir_sesion(modo, version, base))
+        recorrer(abiertas[-1])
+    rss, pss = memoria_mb()
+    print(json.dumps({'rss_mb': rss, 'pss_mb': pss, 'por_sesion_mb': (pss - inicial[1]) / sesiones}))
+
+
+def _worker(modo, barrera, resultados):
+    version = almacen.version_datos()
+    if modo == 'copia':
+        tablas = [pd.merge(almacen.cargar_tabla('afiliados'), almacen.cargar_tabla('proyecciones'), on='id'),
+                  almacen.cargar_tabla('transacciones', columnas=['id_afiliado', 'fecha', 'monto'])]
+    else:
+        tablas = abrir_sesion(modo, version)
+    recorrer(tablas)
+    # Se mide cuando todos los procesos tienen sus tablas cargadas, para repartir bien la PSS
+    barrera.wait()
+    resultados.put(memoria_mb())
+    barrera.wait()
+
+
+def medir_procesos(modo, procesos):
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(procesos)
+    resultados = contexto.Queue()
+    workers = [contexto.Process(target=_worker, args=(modo, barrera, resultados)) for _ in range(procesos)]
+    for worker in workers:
+        worker.start()
+    memorias = [resultados.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return sum(rss for rss, _ in memorias), sum(pss for _, pss in memorias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--afiliados', type=int, default=200_000)
+    parser.add_argument('--transacciones-por-afiliado', type=float, default=10)
+    parser.add_argument('--sesiones', type=int, default=50)
+    parser.add_argument('--procesos', type=int, default=4)
+    parser.add_argument('--medir', choices=['copia', 'compartido'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir_sesiones(args.medir, args.sesiones)
+        return
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        sintetico.generar(args.afiliados, args.transacciones_por_afiliado, formatos=('parquet',))
+        preparar(almacen.version_datos())
+        print(f"Afiliados: {args.afiliados:,}  sesiones: {args.sesiones}  procesos: {args.procesos}")
+        print(f"{'modo':<12} {'RSS (MB)':>10} {'PSS (MB)':>10} {'MB/sesión':>10}")
+        for modo in ['copia', 'compartido']:
+            salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir', modo,
+                                     '--sesiones', str(args.sesiones)],
+                                    capture_output=True, text=True, check=True,
+                                    env={**os.environ, 'PYTHONPATH': RAIZ})
+            resultado = json.loads(salida.stdout)
+            print(f"{modo:<12} {resultado['rss_mb']:>10.1f} {resultado['pss_mb']:>10.1f} "
+                  f"{resultado['por_sesion_mb']:>10.2f}")
+
+        print(f"\n{'modo':<12} {'Σ RSS (MB)':>11} {'Σ PSS (MB)':>11}   ({args.procesos} procesos)")
+        for modo in ['copia', 'compartido']:
+            rss, pss = medir_procesos(modo, args.procesos)
+            print(f"{modo:<12} {rss:>11.1f} {pss:>11.1f}")
+        os.chdir(RAIZ)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: latencia por página de la tabla paginada frente a serializar la tabla completa.
+
+Mide la construcción de los índices de orden, el tiempo de obtener y
+serializar a Arrow una página para varias combinaciones de orden y filtro,
+y el de serializar el DataFrame completo como hace ``st.dataframe(df)``.
+
+Uso:
+    python benchmarks/bench_tabla.py --afiliados 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sintetico
+from tabla import TablaOrdenable
+
+COLUMNAS_ORDEN = ('id', 'nombre', 'edad', 'salario', 'fondo_actual', 'riesgo_pension_insuficiente')
+
+
+def generar(n, semilla=0):
+    afiliados, _, _ = next(sintetico.generar_bloques(n, por_afiliado=0, semilla=semilla, filas_por_bloque=n))
+    return afiliados[list(COLUMNAS_ORDEN)].astype({'fondo_actual': 'category',
+                                                   'riesgo_pension_insuficiente': 'category'})
+
+
+def cronometrar(funcion, repeticiones=20):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--afiliados', type=int, default=1_000_000)
+    parser.add_argument('--tamaño-pagina', type=int, default=50)
+    args = parser.parse_args()
+
+    datos = generar(args.afiliados)
+    inicio = time.perf_counter()
+    tabla = TablaOrdenable(datos, COLUMNAS_ORDEN)
+    print(f"Afiliados: {args.afiliados:,}  construcción de índices: {time.perf_counter() - inicio:.2f} s")
+
+    casos = {
+        'sin filtro, orden por nombre': ('nombre', False, {}, 1),
+        'sin filtro, salario desc, página 10000': ('salario', True, {}, 10000),
+        'fondo=Crecimiento, orden por edad': ('edad', False, {'fondo_actual': 'Crecimiento'}, 1),
+        'fondo y riesgo, orden por salario': ('salario', False,
+                                              {'fondo_actual': 'Crecimiento',
+                                               'riesgo_pension_insuficiente': 'Alto'}, 1),
+        'nombre comienza con "Ana R"': ('id', False, {'nombre': 'Ana R'}, 1),
+    }
+    for nombre, (orden, descendente, filtros, numero) in casos.items():
+        def pagina():
+            filas, _ = tabla.pagina(orden, descendente, filtros, numero, args.tamaño_pagina)
+            pa.Table.from_pandas(filas)
+        print(f"{nombre:<42} {cronometrar(pagina):>9.2f} ms/página")
+
+    completo = cronometrar(lambda: pa.Table.from_pandas(datos), repeticiones=3)
+    print(f"{'tabla completa (st.dataframe(df))':<42} {completo:>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
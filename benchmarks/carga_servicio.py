@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del servicio HTTP: peticiones por segundo y latencia p50/p99.
+
+Lanza `--concurrencia` clientes asíncronos contra cada endpoint durante
+`--segundos`. Con `--iniciar` levanta el servicio con uvicorn en un
+subproceso; si no, usa el que ya esté escuchando en `--url`. Requiere httpx
+(`pip install -r benchmarks/requirements.txt`).
+
+Uso:
+    python benchmarks/carga_servicio.py --iniciar --workers 4 --concurrencia 64 --segundos 10
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peticiones(rng, lote, max_id):
+    """Generadores de (método, ruta, cuerpo) para cada endpoint."""
+    def proyecciones():
+        perfiles = [{'edad': int(e), 'salario': float(s), 'años_cotizacion': int(a), 'aportacion': 1000.0}
+                    for e, s, a in zip(rng.integers(25, 60, lote), rng.integers(10000, 100000, lote),
+                                       rng.integers(1, 30, lote))]
+        return 'POST', '/proyecciones', {'perfiles': perfiles}
+
+    def cambios_fondo():
+        cambios = [{'id_afiliado': int(i), 'nuevo_fondo': str(f)}
+                   for i, f in zip(rng.integers(1, max_id + 1, lote),
+                                   rng.choice(['Conservador', 'Balanceado', 'Crecimiento'], lote))]
+        return 'POST', '/cambios-fondo', {'cambios': cambios}
+
+    def cumplimiento():
+        return 'POST', '/cumplimiento', {'ids': rng.integers(1, max_id + 1, lote).tolist()}
+
+    return {'proyecciones': proyecciones, 'cambios-fondo': cambios_fondo, 'cumplimiento': cumplimiento}
+
+
+async def cargar(url, generar, concurrencia, segundos):
+    latencias = []
+    errores = 0
+    fin = time.perf_counter() + segundos
+
+    async def cliente(http):
+        nonlocal errores
+        while time.perf_counter() < fin:
+            metodo, ruta, cuerpo = generar()
+            inicio = time.perf_counter()
+            respuesta = await http.request(metodo, ruta, json=cuerpo)
+            latencias.append(time.perf_counter() - inicio)
+            errores += respuesta.status_code != 200
+
+    limites = httpx.Limits(max_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as http:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(http) for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+    return np.array(latencias) * 1000, errores, duracion
+
+
+def esperar_servicio(url, intentos=100):
+    for _ in range(intentos):
+        try:
+            if httpx.get(f"{url}/salud").status_code == 200:
+                return httpx.get(f"{url}/salud").json()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El servicio no respondió en {url}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--iniciar', action='store_true', help="Levanta uvicorn en un subproceso")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--concurrencia', type=int, default=32)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--lote', type=int, default=100, help="Registros por petición")
+    args = parser.parse_args()
+
+    servidor = None
+    if args.iniciar:
+        puerto = args.url.rsplit(':', 1)[1]
+        servidor = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'servicio:app', '--port', puerto,
+                                     '--workers', str(args.workers), '--log-level', 'warning'], cwd=RAIZ)
+    try:
+        salud = esperar_servicio(args.url)
+        rng = np.random.default_rng(0)
+        print(f"Afiliados: {salud['afiliados']:,}  concurrencia: {args.concurrencia}  lote: {args.lote}")
+        print(f"{'endpoint':<15} {'peticiones':>10} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errores':>8}")
+        for nombre, generar in peticiones(rng, args.lote, salud['afiliados']).items():
+            latencias, errores, duracion = asyncio.run(cargar(args.url, generar, args.concurrencia, args.segundos))
+            print(f"{nombre:<15} {len(latencias):>10,} {len(latencias) / duracion:>9.1f} "
+                  f"{np.percentile(latencias, 50):>9.1f} {np.percentile(latencias, 99):>9.1f} {errores:>8}")
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Tablas de sólo lectura compartidas entre sesiones y procesos.
+
+Cada tabla se escribe una vez por versión de los datos como archivo Arrow IPC
+sin comprimir en 'datos/compartido/' y se abre con un mapeo de memoria. Los
+DataFrames resultantes son vistas sobre el mapeo: las columnas numéricas, de
+fecha y de texto no se copian y no se pueden modificar, y todos los procesos
+que abren el mismo archivo (sesiones de Streamlit, workers de gunicorn)
+comparten las mismas páginas del caché del sistema operativo.
+"""
+
+import os
+
+import pyarrow as pa
+
+import almacen
+
+
+DIRECTORIO_COMPARTIDO = os.path.join(almacen.DIRECTORIO_DATOS, 'compartido')
+# Versiones que se conservan por tabla (la recién exportada y las anteriores)
+VERSIONES_CONSERVADAS = 2
+
+
+def ruta(nombre, version):
+    """Archivo Arrow IPC de la tabla `nombre` en `version`."""
+    return os.path.join(DIRECTORIO_COMPARTIDO, f'{nombre}-{version}.arrow')
+
+
+def exportar(nombre, datos, version):
+    """
+    Escribe `datos` como la tabla compartida `nombre` de `version`.
+
+    Se conservan las `VERSIONES_CONSERVADAS` versiones más recientes: otros
+    procesos pueden tener mapeada la anterior o estar por abrirla mientras
+    recargan. Las más antiguas se borran.
+    """
+    os.makedirs(DIRECTORIO_COMPARTIDO, exist_ok=True)
+    destino = ruta(nombre, version)
+    lote = pa.Table.from_pandas(datos, preserve_index=False)
+    # Temporal propio del proceso: varios workers pueden exportar la misma tabla a la vez
+    temporal = f'{destino}.{os.getpid()}.tmp'
+    with pa.OSFile(temporal, 'wb') as archivo, pa.ipc.new_file(archivo, lote.schema) as escritor:
+        escritor.write_table(lote)
+    os.replace(temporal, destino)
+    for anterior in versiones(nombre)[:-VERSIONES_CONSERVADAS]:
+        try:
+            os.remove(ruta(nombre, anterior))
+        except FileNotFoundError:
+            # Otro worker exportó la misma tabla y ya la borró
+            pass
+
+
+def versiones(nombre):
+    """Versiones exportadas de la tabla `nombre`, de la más antigua a la más reciente."""
+    encontradas = []
+    for archivo in os.listdir(DIRECTORIO_COMPARTIDO):
+        version = archivo[len(nombre) + 1:-len('.arrow')]
+        if archivo.startswith(f'{nombre}-') and archivo.endswith('.arrow') and version.isdigit():
+            encontradas.append(int(version))
+    return sorted(encontradas)
+
+
+def abrir(nombre, version):
+    """DataFrame de sólo lectura mapeado sobre la tabla compartida; FileNotFoundError si no existe."""
+    lote = pa.ipc.open_file(pa.memory_map(ruta(nombre, version), 'r')).read_all()
+    return lote.to_pandas(split_blocks=True)
+
+
+def tabla(nombre, version, construir):
+    """Tabla compartida `nombre` de `version`; si falta, la exporta a partir de ``construir()``."""
+    try:
+        return abrir(nombre, version)
+    except FileNotFoundError:
+        exportar(nombre, construir(), version)
+        return abrir(nombre, version)
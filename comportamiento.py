@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Patrones de comportamiento de los afiliados y riesgo de deserción.
+
+Las transacciones se resumen por afiliado y mes en la tabla
+'aportaciones_mensuales', que se actualiza de forma incremental: sólo se
+leen las partes de transacciones que no se habían procesado (las que añade
+`ingesta.ingerir_lote`), y se reconstruye desde cero si alguna parte ya
+procesada cambió. Sobre esa tabla se calculan ventanas móviles que terminan
+en el mes de corte (la última fecha del historial) y se guardan en
+'caracteristicas_comportamiento', una fila por afiliado:
+
+- aportaciones en los últimos 3, 6 y 12 meses y monto de los últimos 12
+- meses con aportación en los últimos 12 y racha de meses sin aportar más
+  larga desde la primera aportación
+- días sin aportar al corte y tendencia (ritmo de los últimos 3 meses
+  frente a los 9 anteriores)
+- puntaje de riesgo de deserción entre 0 y 1 y su nivel
+
+Las páginas leen la tabla ya calculada; los hallazgos por banda de edad y
+salario se agregan a partir de ella.
+
+Uso:
+    python comportamiento.py
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import almacen
+import ingesta
+
+
+TABLA_MENSUAL = 'aportaciones_mensuales'
+TABLA_CARACTERISTICAS = 'caracteristicas_comportamiento'
+COLUMNAS = ['id_afiliado', 'fecha', 'monto']
+VENTANAS_MESES = (3, 6, 12)
+DIAS_INACTIVIDAD = 180
+# Peso de cada componente en el puntaje de deserción (suman 1)
+PESOS_DESERCION = {'inactividad': 0.5, 'irregularidad': 0.3, 'caida': 0.2}
+UMBRALES_DESERCION = {'Alto': 0.6, 'Medio': 0.3}
+BANDAS_EDAD = ([0, 30, 40, 50, 60, np.inf], ['<30', '30-39', '40-49', '50-59', '60+'])
+BANDAS_SALARIO = ([0, 15000, 25000, 40000, np.inf], ['<15k', '15k-25k', '25k-40k', '40k+'])
+EDAD_MAYOR = 50
+
+
+def _clave(id_afiliado, mes):
+    # id y mes en un solo entero: ordenar por la clave es ordenar por (id_afiliado, mes)
+    return np.asarray(id_afiliado, dtype=np.int64) << 16 | np.asarray(mes, dtype=np.int64)
+
+
+def _resumir(claves, conteos, sumas):
+    """Resumen mensual ordenado por (id_afiliado, mes) a partir de claves posiblemente repetidas."""
+    agrupado = pd.DataFrame({'n': conteos, 'suma': sumas}).groupby(claves).sum()
+    claves = agrupado.index.to_numpy()
+    return pd.DataFrame({'id_afiliado': claves >> 16, 'mes': (claves & 0xFFFF).astype(np.int32),
+                         'n': agrupado['n'].to_numpy(dtype=np.int32), 'suma': agrupado['suma'].to_numpy()})
+
+
+def mensualizar(lotes):
+    """Conteo y suma de aportaciones por (afiliado, mes) de un iterable de bloques de transacciones."""
+    claves, sumas = [], []
+    for bloque in lotes:
+        meses = bloque['fecha'].to_numpy().astype('datetime64[M]').astype(np.int64)
+        claves.append(_clave(bloque['id_afiliado'].to_numpy(), meses))
+        sumas.append(bloque['monto'].to_numpy(dtype=float))
+    claves = np.concatenate(claves) if claves else np.zeros(0, dtype=np.int64)
+    return _resumir(claves, np.ones(len(claves), dtype=np.int32), np.concatenate(sumas) if sumas else np.zeros(0))
+
+
+def combinar(mensuales, nuevos):
+    """
+    Suma el resumen `nuevos` al resumen `mensuales` (ambos ordenados por afiliado y mes).
+
+    Las celdas existentes se actualizan en su lugar y las nuevas se insertan
+    en su posición, sin reagrupar el resumen completo.
+    """
+    base = _clave(mensuales['id_afiliado'], mensuales['mes'])
+    claves = _clave(nuevos['id_afiliado'], nuevos['mes'])
+    posiciones = np.searchsorted(base, claves)
+    existentes = posiciones < len(base)
+    existentes[existentes] = base[posiciones[existentes]] == claves[existentes]
+
+    combinado = {columna: mensuales[columna].to_numpy().copy() for columna in mensuales}
+    for columna in ('n', 'suma'):
+        combinado[columna][posiciones[existentes]] += nuevos[columna].to_numpy()[existentes]
+    return pd.DataFrame({columna: np.insert(valores, posiciones[~existentes],
+                                            nuevos[columna].to_numpy()[~existentes])
+                         for columna, valores in combinado.items()})
+
+
+def actualizar_mensuales():
+    """Resumen mensual de la versión actual, procesando sólo las partes nuevas de transacciones."""
+    version = almacen.version_datos()
+    firmas = almacen.firmas_partes('transacciones')
+    procesadas = almacen.metadatos_tabla(TABLA_MENSUAL).get('partes')
+    if procesadas is not None and all(firmas.get(parte) == firma for parte, firma in procesadas.items()):
+        mensuales = almacen.cargar_tabla(TABLA_MENSUAL)
+        nuevas = [parte for parte in firmas if parte not in procesadas]
+        if not nuevas and almacen.version_tabla(TABLA_MENSUAL) == version:
+            return mensuales
+        if nuevas:
+            mensuales = combinar(mensuales, mensualizar(
+                almacen.iterar_lotes('transacciones', columnas=COLUMNAS, partes=nuevas)))
+    else:
+        mensuales = mensualizar(almacen.iterar_lotes('transacciones', columnas=COLUMNAS))
+    almacen.escribir_tabla(TABLA_MENSUAL, mensuales, version, partes=firmas)
+    return mensuales
+
+
+def _racha_inactiva(fila, meses, meses_sin_aportar, n_afiliados):
+    """
+    Meses consecutivos sin aportar más largos por afiliado, contando desde la primera aportación.
+
+    `fila` y `meses` vienen del resumen mensual (ordenado por afiliado y mes);
+    la racha es el mayor hueco entre dos meses con aportación del mismo
+    afiliado o, si es mayor, `meses_sin_aportar` desde la última hasta el corte.
+    """
+    maxima = np.zeros(n_afiliados, dtype=np.int64)
+    mismo_afiliado = fila[1:] == fila[:-1]
+    np.maximum.at(maxima, fila[1:][mismo_afiliado], np.diff(meses)[mismo_afiliado] - 1)
+    return np.maximum(maxima, meses_sin_aportar)
+
+
+def caracteristicas(afiliados, mensuales, ultima_aportacion):
+    """
+    Tabla de características por afiliado, en el orden de `afiliados`.
+
+    `afiliados` necesita id, nombre, edad y salario; `ultima_aportacion` es
+    una Series de fechas indexada por id_afiliado.
+    """
+    ids = afiliados['id'].to_numpy()
+    n_afiliados = len(ids)
+    corte = ultima_aportacion.max() if len(ultima_aportacion) else pd.NaT
+    mes_corte = np.datetime64(corte, 'M').astype(np.int64) if pd.notna(corte) else 0
+    fila = pd.Index(ids).get_indexer(mensuales['id_afiliado'].to_numpy())
+    conocidos = fila >= 0
+    fila = fila[conocidos]
+    atraso = mes_corte - mensuales['mes'].to_numpy()[conocidos]  # 0 = mes de corte
+    # Las ventanas sólo miran los últimos 12 meses: se filtran una vez
+    recientes = atraso < max(VENTANAS_MESES)
+    fila_reciente, atraso_reciente = fila[recientes], atraso[recientes]
+    conteo = mensuales['n'].to_numpy()[conocidos][recientes]
+
+    def ventana(inicio, fin=0, pesos=conteo):
+        # Suma de los meses con fin <= atraso < inicio
+        dentro = (atraso_reciente >= fin) & (atraso_reciente < inicio)
+        return np.bincount(fila_reciente[dentro], pesos[dentro], minlength=n_afiliados)
+
+    datos = pd.DataFrame({
+        'id': ids,
+        'nombre': afiliados['nombre'].array,
+        'edad': afiliados['edad'].to_numpy(),
+        'salario': afiliados['salario'].to_numpy(),
+        'banda_edad': pd.cut(afiliados['edad'], BANDAS_EDAD[0], labels=BANDAS_EDAD[1], right=False).array,
+        'banda_salario': pd.cut(afiliados['salario'], BANDAS_SALARIO[0], labels=BANDAS_SALARIO[1],
+                                right=False).array,
+    })
+    for meses in VENTANAS_MESES:
+        datos[f'aportaciones_{meses}m'] = ventana(meses).astype(np.int64)
+    datos['monto_12m'] = ventana(12, pesos=mensuales['suma'].to_numpy()[conocidos][recientes])
+    datos['meses_activos_12m'] = ventana(12, pesos=np.ones(len(fila_reciente))).astype(np.int64)
+
+    historial = int(atraso.max()) + 1 if len(atraso) else 1
+    ultima = ultima_aportacion.reindex(ids)
+    meses_sin_aportar = mes_corte - ultima.to_numpy().astype('datetime64[M]').astype(np.int64)
+    datos['racha_inactiva_max'] = _racha_inactiva(fila, mensuales['mes'].to_numpy()[conocidos],
+                                                  np.where(ultima.notna(), meses_sin_aportar, 0), n_afiliados)
+
+    dias = (corte - ultima).dt.days.to_numpy(dtype=float)
+    datos['dias_sin_aportar'] = np.nan_to_num(dias, nan=np.inf)
+    # Ritmo mensual de los últimos 3 meses frente al de los 9 anteriores (1 = estable)
+    previos = min(max(historial - 3, 0), 9)
+    ritmo_previo = ventana(3 + previos, 3) / max(previos, 1)
+    ritmo_reciente = datos['aportaciones_3m'].to_numpy() / min(historial, 3)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        datos['tendencia'] = np.where(ritmo_previo > 0, ritmo_reciente / ritmo_previo, 1.0)
+
+    componentes = {
+        'inactividad': np.clip(datos['dias_sin_aportar'] / DIAS_INACTIVIDAD, 0, 1),
+        'irregularidad': 1 - datos['meses_activos_12m'] / min(historial, 12),
+        'caida': np.clip(1 - datos['tendencia'], 0, 1),
+    }
+    datos['riesgo_desercion'] = sum(PESOS_DESERCION[nombre] * valor for nombre, valor in componentes.items())
+    datos['nivel_desercion'] = np.select(
+        [datos['riesgo_desercion'] >= UMBRALES_DESERCION['Alto'],
+         datos['riesgo_desercion'] >= UMBRALES_DESERCION['Medio']], ['Alto', 'Medio'], 'Bajo')
+    return datos
+
+
+def materializar():
+    """Actualiza el resumen mensual y recalcula las características de la versión actual."""
+    version = almacen.version_datos()
+    mensuales = actualizar_mensuales()
+    afiliados = almacen.cargar_tabla('afiliados', columnas=['id', 'nombre', 'edad', 'salario'])
+    ultima = ingesta.cargar_agregados().set_index('id_afiliado')['ultima_aportacion']
+    tabla = caracteristicas(afiliados, mensuales, ultima)
+    almacen.escribir_tabla(TABLA_CARACTERISTICAS, tabla, version)
+    return tabla
+
+
+def cargar_caracteristicas():
+    """Características de la versión actual; se recalculan si faltan o están desfasadas."""
+    if almacen.version_tabla(TABLA_CARACTERISTICAS) != almacen.version_datos():
+        return materializar()
+    return almacen.cargar_tabla(TABLA_CARACTERISTICAS)
+
+
+def _comparar(valor, referencia, mayor, menor, igual):
+    return igual if np.isclose(valor, referencia) else mayor if valor > referencia else menor
+
+
+def frecuencia_por_banda(caracteristicas, banda):
+    """Afiliados, aportaciones promedio en 12 meses y porcentaje activo en 6 meses por banda."""
+    return (caracteristicas.groupby(banda, observed=False)
+            .agg(afiliados=('id', 'size'), aportaciones_12m=('aportaciones_12m', 'mean'),
+                 meses_activos_12m=('meses_activos_12m', 'mean'),
+                 activos_6m=('aportaciones_6m', lambda n: (n > 0).mean() * 100))
+            .reset_index())
+
+
+def hallazgos(caracteristicas):
+    """Hallazgos y recomendaciones (listas de textos) calculados sobre las características."""
+    textos, recomendaciones = [], []
+    por_salario = frecuencia_por_banda(caracteristicas, 'banda_salario').query('afiliados > 0')
+    if len(por_salario) > 1:
+        baja, alta = por_salario.iloc[0], por_salario.iloc[-1]
+        comparacion = _comparar(alta['meses_activos_12m'], baja['meses_activos_12m'], 'más', 'menos', 'la misma')
+        textos.append(f"Los afiliados con salario {alta['banda_salario']} aportan con {comparacion} constancia: "
+                      f"{alta['meses_activos_12m']:.1f} meses con aportación en los últimos 12 frente a "
+                      f"{baja['meses_activos_12m']:.1f} de los de salario {baja['banda_salario']}")
+
+    mayores = caracteristicas['edad'] >= EDAD_MAYOR
+    if mayores.any() and (~mayores).any():
+        frecuencia_mayores = caracteristicas.loc[mayores, 'aportaciones_12m'].mean()
+        frecuencia_menores = caracteristicas.loc[~mayores, 'aportaciones_12m'].mean()
+        comparacion = _comparar(frecuencia_mayores, frecuencia_menores, 'mayor', 'menor', 'la misma')
+        textos.append(f"Los afiliados de {EDAD_MAYOR} años o más muestran {comparacion} frecuencia de "
+                      f"aportaciones voluntarias ({frecuencia_mayores:.1f} en 12 meses frente a "
+                      f"{frecuencia_menores:.1f} de los menores de {EDAD_MAYOR})")
+        if frecuencia_mayores < frecuencia_menores:
+            recomendaciones.append(f"Implementar campaña de concientización para afiliados mayores de "
+                                   f"{EDAD_MAYOR} años")
+
+    inactivos = int((caracteristicas['aportaciones_6m'] == 0).sum())
+    textos.append(f"Se detectaron {inactivos:,} afiliados sin aportaciones voluntarias en los últimos 6 meses")
+    en_riesgo = int((caracteristicas['nivel_desercion'] == 'Alto').sum())
+    textos.append(f"{en_riesgo:,} afiliados tienen riesgo alto de deserción")
+    if en_riesgo or (caracteristicas['tendencia'] < 1).any():
+        recomendaciones.append("Crear programa de recordatorios automatizados para aportaciones")
+    if inactivos:
+        recomendaciones.append("Contactar a afiliados inactivos en aportaciones voluntarias")
+    return textos, recomendaciones
+
+
+def main():
+    argparse.ArgumentParser(description="Calcula las características de comportamiento de los afiliados.") \
+        .parse_args()
+    almacen.asegurar_almacen()
+    inicio = time.perf_counter()
+    tabla = materializar()
+    print(f"{len(tabla):,} afiliados en {time.perf_counter() - inicio:.2f} s")
+    textos, recomendaciones = hallazgos(tabla)
+    for texto in textos + recomendaciones:
+        print(f"- {texto}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Motor declarativo de reglas de cumplimiento.
+
+Cada `Regla` es un predicado vectorizado sobre columnas por afiliado. Todas
+las reglas se evalúan en una sola pasada por bloques de filas, en paralelo, y
+el resultado (conteo y mapa de bits de afiliados marcados por regla) se
+materializa en la tabla 'alertas_cumplimiento' del almacén, ligada a la
+versión de los datos. La página de Supervisión de Riesgos lee esa tabla en
+lugar de recalcular.
+
+Los cambios bruscos de salario se leen del historial que registra el almacén
+al reconvertir afiliados.csv; la alerta dura `DIAS_CAMBIO_SALARIO` días desde
+el cambio, y las alertas se recalculan al cambiar la versión o el día.
+
+Uso (ejecución nocturna):
+    python cumplimiento.py
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+import almacen
+import atipicas
+import ingesta
+
+
+TABLA_ALERTAS = 'alertas_cumplimiento'
+DIAS_SIN_APORTAR = 180
+CAMBIO_BRUSCO_SALARIO = 0.3  # variación relativa contra el salario anterior
+DIAS_CAMBIO_SALARIO = 90  # días que se mantiene la alerta después del cambio
+FILAS_POR_BLOQUE = 1_000_000
+
+
+@dataclass(frozen=True)
+class Regla:
+    tipo: str
+    severidad: str
+    predicado: Callable[[pd.DataFrame], pd.Series]
+
+
+REGLAS = [
+    Regla("Pensión insuficiente", "Alta",
+          lambda d: d['pension_proyectada_base'] < d['salario'] * 0.4),
+    Regla("Fondo inadecuado para edad", "Media",
+          lambda d: ((d['edad'] > 55) & (d['fondo_actual'] == 'Crecimiento')) |
+                    ((d['edad'] < 40) & (d['fondo_actual'] == 'Conservador'))),
+    Regla("Aportaciones atípicas", "Media",
+          lambda d: d['aportaciones_atipicas'] > 0),
+    Regla("Sin aportaciones recientes", "Baja",
+          lambda d: d['dias_sin_aportar'] > DIAS_SIN_APORTAR),
+    Regla("Cambios bruscos en salario", "Media",
+          lambda d: (d['salario'] / d['salario_anterior'] - 1).abs() > CAMBIO_BRUSCO_SALARIO),
+]
+
+
+def salarios_anteriores(ids, fecha):
+    """Salario previo de cada id si cambió en los `DIAS_CAMBIO_SALARIO` días anteriores a `fecha`, si no NaN."""
+    if almacen.version_tabla(almacen.TABLA_HISTORIAL_SALARIOS) is None:
+        return np.full(len(ids), np.nan)
+    historial = almacen.cargar_tabla(almacen.TABLA_HISTORIAL_SALARIOS)
+    vigentes = historial[historial['fecha_cambio'] > fecha - pd.Timedelta(days=DIAS_CAMBIO_SALARIO)]
+    return vigentes.set_index('id')['salario_anterior'].reindex(ids).to_numpy(dtype=float)
+
+
+def preparar_datos(fecha=None):
+    """
+    Columnas por afiliado que usan las reglas, en el orden de afiliados del almacén.
+
+    Los días sin aportar se miden contra la última fecha registrada en el
+    historial (fecha de corte), no contra la fecha del sistema; la vigencia de
+    los cambios de salario se mide contra `fecha` (hoy si no se indica).
+    """
+    fecha = pd.Timestamp.now() if fecha is None else pd.Timestamp(fecha)
+    afiliados = almacen.cargar_tabla('afiliados', columnas=['id', 'edad', 'salario', 'fondo_actual'])
+    proyecciones = almacen.cargar_tabla('proyecciones', columnas=['id', 'pension_proyectada_base'])
+    datos = afiliados.merge(proyecciones, on='id')
+    datos['salario_anterior'] = salarios_anteriores(datos['id'], fecha)
+
+    agregados = ingesta.cargar_agregados()
+    ultima = agregados.set_index('id_afiliado')['ultima_aportacion']
+    dias = (ultima.max() - ultima.reindex(datos['id'])).dt.days.to_numpy(dtype=float)
+    datos['dias_sin_aportar'] = np.nan_to_num(dias, nan=np.inf)
+
+    marcadas = atipicas.detectar_atipicas()['id_afiliado'].value_counts()
+    datos['aportaciones_atipicas'] = marcadas.reindex(datos['id'], fill_value=0).to_numpy()
+    return datos
+
+
+def _evaluar_bloque(bloque, reglas):
+    return np.column_stack([np.asarray(regla.predicado(bloque), dtype=bool) for regla in reglas])
+
+
+def evaluar(datos, reglas=REGLAS, filas_por_bloque=FILAS_POR_BLOQUE, hilos=None):
+    """Matriz booleana (filas x reglas) evaluando todas las reglas en cada bloque de filas."""
+    bloques = [datos.iloc[inicio:inicio + filas_por_bloque] for inicio in range(0, len(datos), filas_por_bloque)]
+    if not bloques:
+        return np.zeros((0, len(reglas)), dtype=bool)
+    with ThreadPoolExecutor(max_workers=hilos or os.cpu_count()) as pool:
+        return np.vstack(list(pool.map(lambda bloque: _evaluar_bloque(bloque, reglas), bloques)))
+
+
+def materializar(reglas=REGLAS, fecha=None):
+    """Evalúa las reglas sobre la versión actual de los datos y guarda conteos y mapas de bits."""
+    version = almacen.version_datos()
+    fecha = pd.Timestamp.now() if fecha is None else pd.Timestamp(fecha)
+    marcas = evaluar(preparar_datos(fecha), reglas)
+    alertas = pd.DataFrame({
+        'tipo': [regla.tipo for regla in reglas],
+        'afiliados': marcas.sum(axis=0),
+        'severidad': [regla.severidad for regla in reglas],
+        'mapa_bits': [np.packbits(marcas[:, i]).tobytes() for i in range(len(reglas))],
+    })
+    almacen.escribir_tabla(TABLA_ALERTAS, alertas, version, fecha=fecha.date().isoformat())
+    return alertas
+
+
+def cargar_alertas():
+    """Alertas de la versión actual de los datos y del día; se recalculan si faltan o están desfasadas."""
+    if (almacen.version_tabla(TABLA_ALERTAS) != almacen.version_datos()
+            or almacen.metadatos_tabla(TABLA_ALERTAS).get('fecha') != pd.Timestamp.now().date().isoformat()):
+        return materializar()
+    return almacen.cargar_tabla(TABLA_ALERTAS)
+
+
+def posiciones_marcadas(alertas, tipo, filas):
+    """Posiciones (en el orden de afiliados) de las filas marcadas por la regla `tipo`."""
+    mapa = alertas.loc[alertas['tipo'] == tipo, 'mapa_bits'].iloc[0]
+    return np.flatnonzero(np.unpackbits(np.frombuffer(mapa, dtype=np.uint8), count=filas))
+
+
+def marcas(alertas, posiciones):
+    """Tabla booleana (posiciones x reglas) consultando sólo los bits de `posiciones`."""
+    posiciones = np.asarray(posiciones, dtype=np.int64)
+    return pd.DataFrame({
+        alerta['tipo']: (np.frombuffer(alerta['mapa_bits'], dtype=np.uint8)[posiciones >> 3]
+                         >> (7 - (posiciones & 7)) & 1).astype(bool)
+        for _, alerta in alertas.iterrows()
+    })
+
+
+def main():
+    argparse.ArgumentParser(description="Evalúa las reglas de cumplimiento sobre toda la base.").parse_args()
+    almacen.asegurar_almacen()
+    alertas = materializar()
+    print(alertas.drop(columns='mapa_bits').to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Esquema declarado de las cuatro tablas y lectura validada de sus CSV.
+
+Cada columna tiene un tipo de Arrow fijo; las de baja cardinalidad se
+cargan como categóricas y las fechas se leen con el formato día primero
+'%d/%m/%Y' (con 'AAAA-MM-DD' como alternativa explícita, el formato que
+escribía el generador de respaldo). Nunca se infiere el formato fila por
+fila, así que '03/04/2024' siempre es 3 de abril.
+
+Los CSV se leen con el lector de pyarrow por bloques. Las filas con valores
+que no se pueden convertir, faltantes en columnas obligatorias o fuera de
+rango no se cargan y se reportan con su número de línea, columna, valor y
+motivo.
+
+Uso (validar un archivo sin cargarlo):
+    python esquema.py transacciones.csv --tabla transacciones
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as csv
+
+
+FORMATO_FECHA = '%d/%m/%Y'
+FORMATO_FECHA_ALTERNO = '%Y-%m-%d'
+FECHA = pa.timestamp('ns')
+BYTES_POR_BLOQUE = 64 * 2**20
+
+ESQUEMAS = {
+    'afiliados': pa.schema([
+        ('id', pa.int64()), ('nombre', pa.string()), ('edad', pa.int16()), ('salario', pa.float64()),
+        ('años_cotizacion', pa.int16()), ('estado_civil', pa.string()), ('hijos', pa.int8()),
+        ('escolaridad', pa.string()), ('riesgo_pension_insuficiente', pa.string()),
+        ('fondo_actual', pa.string()),
+    ]),
+    'proyecciones': pa.schema([
+        ('id', pa.int64()), ('edad_jubilacion', pa.int16()), ('pension_proyectada_base', pa.float64()),
+        ('pension_optimista', pa.float64()), ('pension_pesimista', pa.float64()),
+        ('recomendacion_aportacion', pa.string()),
+    ]),
+    'fondos': pa.schema([
+        ('fondo', pa.string()), ('rendimiento_anual', pa.float64()), ('riesgo', pa.string()),
+        ('comision', pa.float64()), ('perfil_recomendado', pa.string()), ('rentabilidad_5años', pa.float64()),
+    ]),
+    'transacciones': pa.schema([
+        ('id_afiliado', pa.int64()), ('fecha', FECHA), ('monto', pa.float64()), ('tipo', pa.string()),
+        ('concepto', pa.string()),
+    ]),
+}
+
+# Columnas de baja cardinalidad que se cargan como categóricas
+CATEGORICAS = {
+    'afiliados': ['estado_civil', 'escolaridad', 'riesgo_pension_insuficiente', 'fondo_actual'],
+    'proyecciones': [],
+    'fondos': [],
+    'transacciones': ['tipo', 'concepto'],
+}
+
+# Columnas de texto que pueden venir vacías; el resto son obligatorias
+OPCIONALES = {
+    'afiliados': ['estado_civil', 'escolaridad'],
+    'proyecciones': ['recomendacion_aportacion'],
+    'fondos': ['perfil_recomendado'],
+    'transacciones': ['tipo', 'concepto'],
+}
+
+# (columna, predicado sobre el arreglo de Arrow, motivo del rechazo)
+VALIDACIONES = {
+    'afiliados': [
+        ('id', lambda valores: pc.greater(valores, 0), "id no positivo"),
+        ('edad', lambda valores: pc.and_(pc.greater_equal(valores, 15), pc.less_equal(valores, 110)),
+         "edad fuera de rango"),
+        ('salario', lambda valores: pc.greater_equal(valores, 0), "salario negativo"),
+        ('años_cotizacion', lambda valores: pc.greater_equal(valores, 0), "años de cotización negativos"),
+    ],
+    'proyecciones': [
+        ('id', lambda valores: pc.greater(valores, 0), "id no positivo"),
+    ],
+    'fondos': [],
+    'transacciones': [
+        ('id_afiliado', lambda valores: pc.greater(valores, 0), "id_afiliado no positivo"),
+        ('monto', lambda valores: pc.is_finite(valores), "monto no finito"),
+    ],
+}
+
+COLUMNAS_RECHAZOS = ['linea', 'columna', 'valor', 'motivo']
+
+
+def _es_texto(tipo):
+    return pa.types.is_string(tipo) or pa.types.is_large_string(tipo)
+
+
+def _anular_corridas(valores, fechas, patron_dia):
+    # strptime acepta días que no existen en el mes ('31/02/2024' -> 2 de marzo). Esas fechas
+    # caen en los días 1 a 3, así que sólo se revisa el día escrito de esas filas.
+    sospechosas = np.flatnonzero(pc.fill_null(pc.less_equal(pc.day(fechas), 3), False)
+                                 .to_numpy(zero_copy_only=False))
+    if not len(sospechosas):
+        return fechas
+    escritos = pc.struct_field(pc.extract_regex(valores.take(sospechosas), patron_dia), [0]).cast(pa.int64())
+    distintos = pc.fill_null(pc.not_equal(escritos, pc.day(fechas.take(sospechosas))), True)
+    corridas = np.zeros(len(fechas), dtype=bool)
+    corridas[sospechosas[distintos.to_numpy(zero_copy_only=False)]] = True
+    if not corridas.any():
+        return fechas
+    return pc.if_else(pa.array(corridas), pa.scalar(None, fechas.type), fechas)
+
+
+def parsear_fechas(valores):
+    """Fechas '%d/%m/%Y' o 'AAAA-MM-DD' de un arreglo de texto; nulo donde no cumple ninguno."""
+    fechas = _anular_corridas(valores, pc.strptime(valores, format=FORMATO_FECHA, unit='ns', error_is_null=True),
+                              r'^\s*(?P<dia>\d{1,2})/')
+    if fechas.null_count > valores.null_count:
+        alternas = pc.strptime(valores, format=FORMATO_FECHA_ALTERNO, unit='ns', error_is_null=True)
+        fechas = pc.coalesce(fechas, _anular_corridas(valores, alternas, r'-(?P<dia>\d{1,2})\s*$'))
+    return fechas
+
+
+def _convertir_columna(valores, tipo):
+    """Convierte `valores` a `tipo`; devuelve el arreglo convertido (nulo donde no se pudo)."""
+    if valores.type == tipo:
+        return valores
+    if pa.types.is_dictionary(valores.type):
+        valores = valores.cast(valores.type.value_type)
+    if _es_texto(valores.type) and pa.types.is_timestamp(tipo):
+        return parsear_fechas(valores)
+    try:
+        return valores.cast(tipo)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # Camino lento sólo para bloques con valores inválidos: se convierte lo que se pueda
+        numeros = pd.to_numeric(pd.Series(valores.to_pandas(), dtype=object), errors='coerce')
+        if pa.types.is_integer(tipo):
+            numeros = numeros.where(numeros == np.floor(numeros))
+        return pa.array(numeros, type=pa.float64(), from_pandas=True).cast(tipo, safe=False)
+
+
+def convertir(tabla, lote, primera_linea=2):
+    """
+    Convierte `lote` (pa.Table) al esquema de `tabla` y separa las filas inválidas.
+
+    Devuelve ``(lote_valido, rechazos)``; `rechazos` es un DataFrame con una
+    fila por valor rechazado (línea del CSV contando el encabezado, columna,
+    valor original y motivo). Las columnas que no están en el esquema se
+    descartan.
+    """
+    esquema = ESQUEMAS[tabla]
+    faltantes = [nombre for nombre in esquema.names if nombre not in lote.column_names]
+    if faltantes:
+        raise ValueError(f"{tabla}: faltan las columnas {faltantes}")
+
+    columnas, problemas = [], []
+    for campo in esquema:
+        original = lote.column(campo.name).combine_chunks()
+        convertida = _convertir_columna(original, campo.type)
+        if campo.name not in OPCIONALES[tabla]:
+            faltante = pc.is_null(original)
+            problemas.append((campo.name, faltante, "valor faltante"))
+            motivo = "fecha no válida (dd/mm/aaaa)" if campo.type == FECHA else f"no es {campo.type}"
+            problemas.append((campo.name, pc.and_(pc.is_null(convertida), pc.invert(faltante)), motivo))
+        columnas.append(convertida)
+    convertido = pa.Table.from_arrays(columnas, schema=esquema)
+    for columna, predicado, motivo in VALIDACIONES[tabla]:
+        valido = predicado(convertido.column(columna))
+        problemas.append((columna, pc.invert(pc.fill_null(valido, True)), motivo))
+
+    invalidas = np.zeros(len(lote), dtype=bool)
+    rechazos = []
+    for columna, mascara, motivo in problemas:
+        filas = np.flatnonzero(mascara.to_numpy(zero_copy_only=False))
+        if len(filas):
+            invalidas[filas] = True
+            rechazos.append(pd.DataFrame({
+                'linea': filas + primera_linea, 'columna': columna,
+                'valor': lote.column(columna).take(filas).cast(pa.string()).to_pandas(), 'motivo': motivo,
+            }))
+    rechazos = (pd.concat(rechazos, ignore_index=True).sort_values('linea', kind='stable') if rechazos
+                else pd.DataFrame(columns=COLUMNAS_RECHAZOS))
+    if invalidas.any():
+        convertido = convertido.filter(pa.array(~invalidas))
+    return convertido, rechazos
+
+
+def leer_csv(ruta, tabla, bytes_por_bloque=BYTES_POR_BLOQUE):
+    """Recorre el CSV de `tabla` en bloques ``(lote_valido, rechazos)`` con el lector de pyarrow."""
+    nombres = ESQUEMAS[tabla].names
+    lector = csv.open_csv(
+        ruta,
+        read_options=csv.ReadOptions(block_size=bytes_por_bloque),
+        # Todo se lee como texto: la conversión con el esquema es la que detecta los valores inválidos
+        convert_options=csv.ConvertOptions(column_types={nombre: pa.string() for nombre in nombres},
+                                           include_columns=nombres, strings_can_be_null=True),
+    )
+    linea = 2
+    for bloque in lector:
+        lote = pa.Table.from_batches([bloque])
+        yield convertir(tabla, lote, linea)
+        linea += len(lote)
+
+
+def tipar(tabla, datos):
+    """
+    Tabla de Arrow con el esquema de `tabla` a partir de un DataFrame.
+
+    A diferencia de `leer_csv`, aquí un valor inválido es un error: se
+    lanza ValueError con las primeras filas rechazadas.
+    """
+    lote, rechazos = convertir(tabla, pa.Table.from_pandas(datos, preserve_index=False), primera_linea=0)
+    if len(rechazos):
+        raise ValueError(f"{tabla}: {len(rechazos)} valores inválidos (fila, columna, valor, motivo):\n"
+                         f"{rechazos.head(10).to_string(index=False)}")
+    return lote
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida un CSV contra el esquema declarado.")
+    parser.add_argument('ruta')
+    parser.add_argument('--tabla', choices=list(ESQUEMAS), required=True)
+    parser.add_argument('--maximo', type=int, default=20, help="Rechazos a mostrar")
+    args = parser.parse_args()
+
+    validas, rechazos = 0, []
+    for lote, rechazados in leer_csv(args.ruta, args.tabla):
+        validas += len(lote)
+        rechazos.append(rechazados)
+    rechazos = pd.concat(rechazos, ignore_index=True) if rechazos else pd.DataFrame(columns=COLUMNAS_RECHAZOS)
+    print(f"{args.ruta}: {validas:,} filas válidas, {rechazos['linea'].nunique():,} filas rechazadas")
+    if len(rechazos):
+        print(rechazos.head(args.maximo).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de gráficas: agrega y reduce los datos en el servidor antes de Plotly.
+
+Los histogramas se binean con NumPy, los pasteles y barras reciben conteos ya
+agregados y la dispersión cambia a mapa de densidad (o muestra estratificada)
+por encima de un umbral de filas, de modo que el tamaño de la figura enviada
+al navegador no crece con las tablas.
+
+Cada figura mostrada con `mostrar` registra su carga útil (bytes de JSON,
+estimados a partir del número de valores de sus trazas para no serializarla
+dos veces) y el tiempo de envío para compararlos con el presupuesto. El
+reporte se reinicia en cada ejecución del script.
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+import instrumentacion
+
+
+UMBRAL_DISPERSION = int(os.environ.get('PENSIONISSSTE_UMBRAL_DISPERSION', 20_000))
+MODO_DISPERSION = os.environ.get('PENSIONISSSTE_MODO_DISPERSION', 'densidad')
+PRESUPUESTO_BYTES = int(os.environ.get('PENSIONISSSTE_PRESUPUESTO_GRAFICA', 1_000_000))
+BINS_DENSIDAD = 60
+LIMITE_BARRAS = 50
+UMBRAL_BARRAS_FECHA = 500
+# Estimación de la carga útil: layout y plantilla, más bytes por valor de las trazas
+BYTES_BASE = 8000
+BYTES_POR_VALOR = 10
+PROPIEDADES_DATOS = ('x', 'y', 'z', 'values', 'labels', 'text', 'hovertext', 'customdata', 'ids',
+                     'width', 'marker.color', 'marker.size')
+
+
+@instrumentacion.medida('graficas.histograma')
+def histograma(valores, nbins, title, label):
+    """Histograma pre-bineado: sólo viajan `nbins` barras."""
+    valores = np.asarray(valores, dtype=float)
+    conteos, bordes = np.histogram(valores[np.isfinite(valores)], bins=nbins)
+    fig = px.bar(x=(bordes[:-1] + bordes[1:]) / 2, y=conteos, title=title,
+                 labels={'x': label, 'y': 'count'})
+    fig.update_traces(width=np.diff(bordes))
+    fig.update_layout(bargap=0)
+    return fig
+
+
+@instrumentacion.medida('graficas.pastel')
+def pastel(conteos, title):
+    """Pastel a partir de una serie de conteos (índice = categoría)."""
+    conteos = conteos[conteos > 0]
+    return px.pie(names=conteos.index.astype(str), values=conteos.to_numpy(), title=title)
+
+
+@instrumentacion.medida('graficas.barras_principales')
+def barras_principales(datos, x, y, title, labels, limite=LIMITE_BARRAS):
+    """Barras de las `limite` filas con mayor `y` cuando hay más categorías que eso."""
+    if len(datos) > limite:
+        title = f"{title} ({limite} con mayor valor de {len(datos):,})"
+        datos = datos.nlargest(limite, y)
+    return px.bar(datos, x=x, y=y, title=title, labels=labels)
+
+
+@instrumentacion.medida('graficas.barras_por_fecha')
+def barras_por_fecha(datos, x, y, title, labels, umbral=UMBRAL_BARRAS_FECHA):
+    """Barras por fecha; por encima de `umbral` filas se suman por mes."""
+    if len(datos) > umbral:
+        mes = datos[x].dt.to_period('M').dt.to_timestamp()
+        datos = datos.groupby(mes)[y].sum().reset_index()
+        title = f"{title} (total mensual)"
+    return px.bar(datos, x=x, y=y, title=title, labels=labels)
+
+
+@instrumentacion.medida('graficas.dispersion')
+def dispersion(datos, x, y, color, title, labels, umbral=UMBRAL_DISPERSION, modo=MODO_DISPERSION,
+               semilla=0):
+    """
+    Dispersión de `x` contra `y`.
+
+    Con más de `umbral` filas se dibuja un mapa de densidad bineado con NumPy
+    (``modo='densidad'``) o una muestra estratificada por cuantiles de `color`
+    de `umbral` filas (``modo='muestra'``).
+    """
+    if len(datos) <= umbral:
+        return px.scatter(datos, x=x, y=y, color=color, title=title, labels=labels)
+
+    if modo == 'muestra':
+        estratos = pd.qcut(datos[color], q=10, duplicates='drop')
+        muestra = datos.groupby(estratos, observed=True).sample(frac=umbral / len(datos),
+                                                                random_state=semilla)
+        return px.scatter(muestra, x=x, y=y, color=color, labels=labels,
+                          title=f"{title} (muestra estratificada de {len(muestra):,} de {len(datos):,})")
+
+    conteos, bordes_x, bordes_y = np.histogram2d(datos[x].to_numpy(dtype=float),
+                                                 datos[y].to_numpy(dtype=float), bins=BINS_DENSIDAD)
+    fig = go.Figure(go.Heatmap(x=(bordes_x[:-1] + bordes_x[1:]) / 2, y=(bordes_y[:-1] + bordes_y[1:]) / 2,
+                               z=np.where(conteos.T > 0, conteos.T, np.nan), colorscale='Viridis',
+                               colorbar={'title': 'Transacciones'}))
+    fig.update_layout(title=f"{title} (densidad de {len(datos):,} transacciones)",
+                      xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y))
+    return fig
+
+
+def estimar_bytes(fig):
+    """Tamaño aproximado en bytes del JSON de la figura, sin serializarla."""
+    valores = 0
+    for traza in fig.data:
+        for propiedad in PROPIEDADES_DATOS:
+            if propiedad in traza:
+                valor = traza[propiedad]
+                if valor is not None and not isinstance(valor, str):
+                    valores += np.size(valor)
+    return BYTES_BASE + valores * BYTES_POR_VALOR
+
+
+def reiniciar_reporte():
+    """Vacía el reporte de carga útil; se llama al inicio de cada ejecución del script."""
+    st.session_state['reporte_graficas'] = {}
+
+
+@instrumentacion.medida('graficas.mostrar')
+def mostrar(fig, nombre):
+    """Muestra la figura y registra su carga útil estimada y el tiempo de envío en la sesión."""
+    carga = estimar_bytes(fig)
+    if carga > PRESUPUESTO_BYTES:
+        st.caption(f"▲ La gráfica '{nombre}' pesa ~{carga / 1024:,.0f} KB "
+                   f"(presupuesto: {PRESUPUESTO_BYTES / 1024:,.0f} KB)")
+    inicio = time.perf_counter()
+    st.plotly_chart(fig, use_container_width=True)
+    st.session_state.setdefault('reporte_graficas', {})[nombre] = {
+        'bytes': carga, 'ms': (time.perf_counter() - inicio) * 1000}
+
+
+def reporte_graficas():
+    """Tabla con la carga útil estimada y el tiempo de envío de las gráficas de esta ejecución."""
+    reportes = st.session_state.get('reporte_graficas', {})
+    return pd.DataFrame([{'gráfica': nombre, 'KB (estimados)': r['bytes'] / 1024, 'ms': r['ms'],
+                          'dentro de presupuesto': r['bytes'] <= PRESUPUESTO_BYTES}
+                         for nombre, r in reportes.items()])
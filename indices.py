@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Índices para consultar un afiliado sin recorrer las tablas completas.
+
+Se construyen una sola vez por versión de los datos: `id` -> posición de fila
+en afiliados y `id_afiliado` -> rango contiguo en las transacciones, que deben
+venir ordenadas por afiliado y fecha (`ordenar_transacciones`; el grafo de
+datos las ordena una vez por versión antes de compartirlas). Sin
+transacciones, sólo se indexan afiliados.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _ordenadas(transacciones):
+    ids = transacciones['id_afiliado'].to_numpy()
+    fechas = transacciones['fecha'].to_numpy()
+    cambio_id = np.diff(ids)
+    return bool(np.all((cambio_id > 0) | ((cambio_id == 0) & (np.diff(fechas) >= np.timedelta64(0)))))
+
+
+def ordenar_transacciones(transacciones):
+    """Transacciones ordenadas por afiliado y fecha; si ya lo están se devuelven sin copiar."""
+    if _ordenadas(transacciones):
+        return transacciones
+    return transacciones.sort_values(['id_afiliado', 'fecha'], kind='stable', ignore_index=True)
+
+
+class IndiceAfiliados:
+    """Búsqueda O(1) (ids contiguos) u O(log N) de afiliados y sus transacciones."""
+
+    def __init__(self, afiliados, transacciones=None):
+        self.afiliados = afiliados.reset_index(drop=True)
+        ids = self.afiliados['id'].to_numpy()
+        self._contiguos = len(ids) > 0 and np.array_equal(ids, np.arange(ids[0], ids[0] + len(ids)))
+        if self._contiguos:
+            self._primer_id = ids[0]
+        else:
+            self._orden = np.argsort(ids, kind='stable')
+            self._ids_ordenados = ids[self._orden]
+
+        if transacciones is None:
+            transacciones = pd.DataFrame({'id_afiliado': np.zeros(0, dtype=np.int64),
+                                          'fecha': pd.to_datetime([])})
+        # Sin copiar si ya vienen ordenadas: pueden ser una vista compartida de sólo lectura
+        self.transacciones = ordenar_transacciones(transacciones).reset_index(drop=True)
+        ids_transacciones = self.transacciones['id_afiliado'].to_numpy()
+        self._ids_con_transacciones, self._inicios = np.unique(ids_transacciones, return_index=True)
+        self._fines = np.append(self._inicios[1:], len(ids_transacciones))
+
+    def posicion(self, id_afiliado):
+        """Fila de `id_afiliado` en `afiliados`, o None si no existe."""
+        if self._contiguos:
+            posicion = id_afiliado - self._primer_id
+            return int(posicion) if 0 <= posicion < len(self.afiliados) else None
+        i = np.searchsorted(self._ids_ordenados, id_afiliado)
+        if i < len(self._ids_ordenados) and self._ids_ordenados[i] == id_afiliado:
+            return int(self._orden[i])
+        return None
+
+    def afiliado(self, id_afiliado):
+        """Fila del afiliado como Series; KeyError si el id no existe."""
+        posicion = self.posicion(id_afiliado)
+        if posicion is None:
+            raise KeyError(id_afiliado)
+        return self.afiliados.iloc[posicion]
+
+    def rango_transacciones(self, id_afiliado):
+        """Rango ``(inicio, fin)`` de las transacciones del afiliado en `transacciones`."""
+        i = np.searchsorted(self._ids_con_transacciones, id_afiliado)
+        if i < len(self._ids_con_transacciones) and self._ids_con_transacciones[i] == id_afiliado:
+            return int(self._inicios[i]), int(self._fines[i])
+        return 0, 0
+
+    def transacciones_de(self, id_afiliado):
+        """Transacciones del afiliado ordenadas por fecha (vista del rango contiguo)."""
+        inicio, fin = self.rango_transacciones(id_afiliado)
+        return self.transacciones.iloc[inicio:fin]
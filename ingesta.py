@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Ingesta incremental de transacciones y agregados persistidos por afiliado.
+
+Cada lote nuevo se añade al almacén como una parte adicional y actualiza la
+tabla 'agregados_transacciones' (conteo, suma, suma de cuadrados y última
+aportación por afiliado) sin volver a recorrer el historial. Los tableros
+leen estos agregados en lugar de agrupar todas las transacciones.
+
+Uso:
+    python ingesta.py aportaciones_2024-03-01.csv [más lotes...]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import almacen
+import esquema
+
+
+TABLA_AGREGADOS = 'agregados_transacciones'
+COLUMNAS = ['id_afiliado', 'fecha', 'monto']
+SIN_FECHA = np.iinfo(np.int64).min
+
+
+def _acumular(lotes, agregados=None):
+    """Suma los lotes de transacciones a `agregados` (o a cero) y devuelve la tabla resultante."""
+    tamaño = int(agregados['id_afiliado'].max()) + 1 if agregados is not None and len(agregados) else 0
+    n = np.zeros(tamaño, dtype=np.int64)
+    suma = np.zeros(tamaño)
+    cuadrados = np.zeros(tamaño)
+    ultima = np.full(tamaño, SIN_FECHA, dtype=np.int64)
+    if tamaño:
+        ids = agregados['id_afiliado'].to_numpy()
+        n[ids] = agregados['n'].to_numpy()
+        suma[ids] = agregados['suma'].to_numpy()
+        cuadrados[ids] = agregados['suma_cuadrados'].to_numpy()
+        ultima[ids] = agregados['ultima_aportacion'].to_numpy().astype('datetime64[ns]').view(np.int64)
+
+    for bloque in lotes:
+        ids = bloque['id_afiliado'].to_numpy().astype(np.int64)
+        if not len(ids):
+            continue
+        if ids.max() >= tamaño:
+            extra = int(ids.max()) + 1 - tamaño
+            n, suma, cuadrados = (np.concatenate([a, np.zeros(extra, dtype=a.dtype)])
+                                  for a in (n, suma, cuadrados))
+            ultima = np.concatenate([ultima, np.full(extra, SIN_FECHA, dtype=np.int64)])
+            tamaño += extra
+        montos = bloque['monto'].to_numpy().astype(float)
+        n += np.bincount(ids, minlength=tamaño)
+        suma += np.bincount(ids, montos, minlength=tamaño)
+        cuadrados += np.bincount(ids, montos * montos, minlength=tamaño)
+        fechas = pd.Series(bloque['fecha'].to_numpy().astype('datetime64[ns]').view(np.int64)).groupby(ids).max()
+        ultima[fechas.index] = np.maximum(ultima[fechas.index], fechas.to_numpy())
+
+    ids = np.flatnonzero(n)
+    return pd.DataFrame({
+        'id_afiliado': ids,
+        'n': n[ids],
+        'suma': suma[ids],
+        'suma_cuadrados': cuadrados[ids],
+        'ultima_aportacion': ultima[ids].view('datetime64[ns]'),
+    })
+
+
+def reconstruir_agregados():
+    """Recalcula los agregados recorriendo todo el historial por lotes."""
+    version = almacen.version_datos()
+    agregados = _acumular(almacen.iterar_lotes('transacciones', columnas=COLUMNAS))
+    almacen.escribir_tabla(TABLA_AGREGADOS, agregados, version)
+    return agregados
+
+
+def cargar_agregados():
+    """Agregados por afiliado de la versión actual; se reconstruyen si faltan o están desfasados."""
+    if almacen.version_tabla(TABLA_AGREGADOS) != almacen.version_datos():
+        return reconstruir_agregados()
+    return almacen.cargar_tabla(TABLA_AGREGADOS)
+
+
+def ingerir_lote(nuevas):
+    """
+    Añade un lote de transacciones (DataFrame con el esquema de transacciones.csv).
+
+    Actualiza los agregados y la versión de los datos; devuelve la nueva versión.
+    """
+    agregados = cargar_agregados()
+    nuevas = almacen.agregar_parte('transacciones', nuevas)
+    agregados = _acumular([nuevas], agregados)
+    version = almacen.incrementar_version()
+    almacen.escribir_tabla(TABLA_AGREGADOS, agregados, version)
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingiere lotes nuevos de transacciones.")
+    parser.add_argument('lotes', nargs='+', help="CSV con el esquema de transacciones.csv")
+    args = parser.parse_args()
+
+    almacen.asegurar_almacen()
+    for ruta in args.lotes:
+        bloques = list(esquema.leer_csv(ruta, 'transacciones'))
+        nuevas = pa.concat_tables([esquema.ESQUEMAS['transacciones'].empty_table()]
+                                  + [lote for lote, _ in bloques]).to_pandas()
+        version = ingerir_lote(nuevas)
+        print(f"{ruta}: {len(nuevas):,} transacciones ingeridas (versión {version})")
+        rechazos = pd.concat([pd.DataFrame(columns=esquema.COLUMNAS_RECHAZOS)]
+                             + [rechazados for _, rechazados in bloques], ignore_index=True)
+        if len(rechazos):
+            print(f"{rechazos['linea'].nunique():,} filas rechazadas:")
+            print(rechazos.head(20).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación de las etapas de cada ejecución: tiempos, memoria y caches.
+
+`tramo` mide una etapa (duración y cambio de memoria residente) y la anida en
+la traza de la ejecución en curso, que se abre con `iniciar_traza` y se
+cierra con `terminar_traza`. Si la variable de entorno
+PENSIONISSSTE_TRAZAS indica un archivo, cada traza terminada se añade a él
+como líneas JSON con campos al estilo de los spans de OpenTelemetry
+(traceId, spanId, parentSpanId, name, startTimeUnixNano, endTimeUnixNano,
+attributes).
+
+Independientemente del archivo, las últimas mediciones de cada etapa y los
+aciertos de cada cache se conservan en memoria para el panel de
+administración (`resumen` y `resumen_caches`).
+"""
+
+import contextlib
+import functools
+import json
+import os
+import resource
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+
+ARCHIVO_TRAZAS = os.environ.get('PENSIONISSSTE_TRAZAS')
+VENTANA = 1000  # mediciones que se conservan por etapa
+
+_local = threading.local()
+_candado = threading.Lock()
+_mediciones = defaultdict(lambda: deque(maxlen=VENTANA))  # etapa -> (ms, MB)
+_llamadas = defaultdict(int)
+_caches = defaultdict(lambda: [0, 0])  # cache -> [aciertos, cálculos]
+
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Fuera de Linux sólo está el máximo histórico
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextlib.contextmanager
+def tramo(nombre, **atributos):
+    """Mide la etapa `nombre`; `atributos` se guardan con el tramo en la traza."""
+    traza = getattr(_local, 'traza', None)
+    id_tramo = secrets.token_hex(8)
+    padre = traza['pila'][-1] if traza and traza['pila'] else None
+    if traza:
+        traza['pila'].append(id_tramo)
+    rss_inicial = _rss_bytes()
+    inicio_ns = time.time_ns()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - inicio) * 1000
+        delta_rss = _rss_bytes() - rss_inicial
+        with _candado:
+            _mediciones[nombre].append((ms, delta_rss / 2**20))
+            _llamadas[nombre] += 1
+        if traza:
+            traza['pila'].pop()
+            traza['tramos'].append({
+                'traceId': traza['id'],
+                'spanId': id_tramo,
+                'parentSpanId': padre,
+                'name': nombre,
+                'startTimeUnixNano': inicio_ns,
+                'endTimeUnixNano': inicio_ns + int(ms * 1e6),
+                'attributes': {**atributos, 'duracion_ms': ms, 'delta_rss_bytes': delta_rss},
+            })
+
+
+def medida(nombre=None):
+    """Decorador que mide cada llamada a la función como un tramo."""
+    def decorador(funcion):
+        etapa = nombre or f'{funcion.__module__}.{funcion.__name__}'
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with tramo(etapa):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def registrar_cache(nombre, acierto):
+    """Cuenta una consulta al cache `nombre` como acierto o como cálculo."""
+    with _candado:
+        _caches[nombre][0 if acierto else 1] += 1
+
+
+def cacheada(decorador_cache, nombre=None):
+    """
+    Aplica `decorador_cache` (p. ej. ``st.cache_data(...)``) contando aciertos.
+
+    La función original sólo se ejecuta cuando el cache no tiene el valor,
+    así que cada llamada que no llega a ella es un acierto.
+    """
+    def decorador(funcion):
+        etapa = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def calcular(*args, **kwargs):
+            _local.calculado = True
+            return funcion(*args, **kwargs)
+
+        en_cache = decorador_cache(calcular)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            # Se restaura la marca de la llamada externa por si hay caches anidados
+            externa = getattr(_local, 'calculado', False)
+            _local.calculado = False
+            try:
+                with tramo(f'cache:{etapa}'):
+                    valor = en_cache(*args, **kwargs)
+                registrar_cache(etapa, acierto=not _local.calculado)
+            finally:
+                _local.calculado = externa
+            return valor
+
+        envoltura.clear = en_cache.clear
+        return envoltura
+    return decorador
+
+
+def iniciar_traza(nombre, **atributos):
+    """Abre la traza de una ejecución con un tramo raíz `nombre` (descarta una traza sin cerrar)."""
+    _local.traza = {'id': secrets.token_hex(16), 'pila': [], 'tramos': []}
+    _local.raiz = contextlib.ExitStack()
+    _local.raiz.enter_context(tramo(nombre, **atributos))
+
+
+def terminar_traza():
+    """Cierra la traza en curso, la escribe en PENSIONISSSTE_TRAZAS si está definido y la devuelve."""
+    traza = getattr(_local, 'traza', None)
+    if traza is None:
+        return []
+    _local.raiz.close()
+    _local.traza = None
+    if ARCHIVO_TRAZAS:
+        with _candado, open(ARCHIVO_TRAZAS, 'a', encoding='utf-8') as archivo:
+            for registro in traza['tramos']:
+                archivo.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+    return traza['tramos']
+
+
+def resumen():
+    """Latencias p50/p95/máx y cambio medio de memoria por etapa, de las últimas mediciones."""
+    with _candado:
+        mediciones = {etapa: np.array(valores) for etapa, valores in _mediciones.items()}
+        llamadas = dict(_llamadas)
+    return pd.DataFrame([{
+        'etapa': etapa,
+        'llamadas': llamadas[etapa],
+        'p50_ms': np.percentile(valores[:, 0], 50),
+        'p95_ms': np.percentile(valores[:, 0], 95),
+        'max_ms': valores[:, 0].max(),
+        'delta_memoria_mb': valores[:, 1].mean(),
+    } for etapa, valores in mediciones.items()],
+        columns=['etapa', 'llamadas', 'p50_ms', 'p95_ms', 'max_ms', 'delta_memoria_mb'])
+
+
+def resumen_caches():
+    """Consultas, aciertos y tasa de aciertos de cada cache registrado."""
+    with _candado:
+        caches = {nombre: tuple(conteos) for nombre, conteos in _caches.items()}
+    return pd.DataFrame([{'cache': nombre, 'consultas': aciertos + calculos, 'aciertos': aciertos,
+                          'tasa_aciertos': aciertos / (aciertos + calculos)}
+                         for nombre, (aciertos, calculos) in caches.items()],
+                        columns=['cache', 'consultas', 'aciertos', 'tasa_aciertos'])
+
+
+def reiniciar():
+    """Borra las mediciones y los contadores acumulados."""
+    with _candado:
+        _mediciones.clear()
+        _llamadas.clear()
+        _caches.clear()
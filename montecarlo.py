@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Simulación Monte Carlo de pensiones por fondo de inversión.
+
+Cada trayectoria simula año con año el rendimiento neto de comisión del fondo
+y capitaliza las aportaciones voluntarias; la parte base de la pensión sigue
+la fórmula del simulador. Las trayectorias se reparten en bloques con
+semillas derivadas de una sola `SeedSequence`, de modo que el resultado es
+reproducible sin importar cuántos procesos se usen.
+
+Las simulaciones chicas corren en el proceso actual; las grandes usan un pool
+de procesos que se crea una sola vez con el contexto 'forkserver' (o 'spawn'),
+porque hacer fork del servidor de Streamlit, que tiene varios hilos, no es
+seguro.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import proyeccion
+
+
+# Volatilidad anual (%) supuesta para cada nivel de riesgo de fondos_inversion.csv
+VOLATILIDAD_POR_RIESGO = {'Bajo': 3.0, 'Medio': 7.0, 'Alto': 12.0}
+
+PERCENTILES = (5, 25, 50, 75, 95)
+TRAYECTORIAS_POR_BLOQUE = 2000
+# Trayectorias x años a partir de las cuales conviene repartir entre procesos (~0.1 s de trabajo)
+MINIMO_PARALELO = 2_000_000
+
+_pools = {}
+_candado_pools = threading.Lock()
+
+
+def parametros_fondos(fondos):
+    """Rendimiento neto de comisión y volatilidad (ambos en %) indexados por fondo."""
+    return pd.DataFrame({
+        'rendimiento_neto': (fondos['rendimiento_anual'] - fondos['comision']).to_numpy(),
+        'volatilidad': fondos['riesgo'].astype(str).map(VOLATILIDAD_POR_RIESGO).to_numpy(),
+    }, index=fondos['fondo'].astype(str).to_numpy())
+
+
+def _simular_bloque(semilla, n, años, rendimiento, volatilidad, aportacion_anual):
+    rng = np.random.default_rng(semilla)
+    rendimientos = rng.normal(rendimiento / 100, volatilidad / 100, size=(n, años))
+    np.clip(rendimientos, -0.99, None, out=rendimientos)
+    saldos = np.zeros((n, años + 1))
+    for k in range(años):
+        saldos[:, k + 1] = saldos[:, k] * (1 + rendimientos[:, k]) + aportacion_anual
+    return saldos
+
+
+def _pool(procesos):
+    """Pool de `procesos` workers, creado la primera vez que se pide y reutilizado después."""
+    with _candado_pools:
+        if procesos not in _pools:
+            metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pools[procesos] = ProcessPoolExecutor(max_workers=procesos,
+                                                   mp_context=multiprocessing.get_context(metodo))
+        return _pools[procesos]
+
+
+def simular_saldos(años, rendimiento, volatilidad, aportacion, n_trayectorias=10000, semilla=0,
+                   procesos=None, trayectorias_por_bloque=TRAYECTORIAS_POR_BLOQUE):
+    """
+    Saldos de las aportaciones voluntarias para `n_trayectorias` trayectorias.
+
+    Devuelve una matriz ``(n_trayectorias, años + 1)`` con el saldo al inicio
+    de cada año. `procesos` limita el pool (None usa todos los núcleos; 1
+    ejecuta en el proceso actual, igual que las simulaciones de menos de
+    `MINIMO_PARALELO` trayectorias x años).
+    """
+    tamaños = [min(trayectorias_por_bloque, n_trayectorias - inicio)
+               for inicio in range(0, n_trayectorias, trayectorias_por_bloque)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamaños))
+    argumentos = [(s, n, años, rendimiento, volatilidad, aportacion * 12) for s, n in zip(semillas, tamaños)]
+
+    procesos = min(procesos or os.cpu_count() or 1, len(argumentos))
+    if procesos <= 1 or n_trayectorias * años < MINIMO_PARALELO:
+        bloques = [_simular_bloque(*a) for a in argumentos]
+    else:
+        bloques = list(_pool(procesos).map(_simular_bloque, *zip(*argumentos)))
+    return np.vstack(bloques)
+
+
+def bandas_pension(edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion,
+                   rendimiento, volatilidad, n_trayectorias=10000, semilla=0, procesos=None,
+                   percentiles=PERCENTILES):
+    """
+    Percentiles de la pensión proyectada a cada edad, de `edad` a `edad_jubilacion`.
+
+    Sin volatilidad todas las trayectorias coinciden: los percentiles son la
+    fórmula cerrada `proyeccion.pension_con_rendimiento` y no se simula.
+    """
+    años = max(int(edad_jubilacion - edad), 0)
+    transcurridos = np.arange(años + 1)
+    columnas = [f'p{p}' for p in percentiles]
+    if not volatilidad:
+        pension = proyeccion.pension_con_rendimiento(edad, salario, años_cotizacion, aportacion, tasa_crecimiento,
+                                                     edad + transcurridos, rendimiento)
+        bandas = pd.DataFrame(np.repeat(pension[:, None], len(columnas), axis=1), columns=columnas)
+    else:
+        saldos = simular_saldos(años, rendimiento, volatilidad, aportacion, n_trayectorias, semilla, procesos)
+        base = proyeccion.pension_base(salario, años_cotizacion) * (1 + tasa_crecimiento / 100 * transcurridos)
+        bandas = pd.DataFrame(np.percentile(saldos, percentiles, axis=0).T + base[:, None], columns=columnas)
+    bandas.insert(0, 'edad', edad + transcurridos)
+    return bandas
+
+
+def comparar_fondos(fondos, edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion,
+                    n_trayectorias=10000, semilla=0, procesos=None, percentiles=PERCENTILES):
+    """Percentiles de la pensión a la edad de jubilación para cada fondo de `fondos`."""
+    filas = []
+    for fondo, parametros in parametros_fondos(fondos).iterrows():
+        bandas = bandas_pension(edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion,
+                                parametros['rendimiento_neto'], parametros['volatilidad'],
+                                n_trayectorias, semilla, procesos, percentiles)
+        filas.append({'fondo': fondo, **bandas.iloc[-1].drop('edad').to_dict()})
+    return pd.DataFrame(filas)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleo de cálculo de los agentes, independiente de Streamlit.
+
+Reúne en funciones importables lo que la aplicación calcula al vuelo
+(proyecciones, simulación de cambio de fondo y pruebas de cumplimiento) para
+que la app, el servicio HTTP y los procesos por lotes usen el mismo código.
+"""
+
+import numpy as np
+import pandas as pd
+
+import almacen
+import cumplimiento
+import perezoso
+import proyeccion
+
+
+EDAD_JUBILACION = 65
+
+ADVERTENCIA_JUBILACION_CERCANA = "Este fondo puede no ser adecuado para perfiles cercanos a la jubilación"
+ADVERTENCIA_HORIZONTE_LARGO = "Este fondo puede ofrecer rendimientos insuficientes para horizontes largos"
+
+
+def advertencias_cambio_fondo(edad, nuevo_fondo, edad_jubilacion=EDAD_JUBILACION):
+    """Advertencia del agente para cada cambio de fondo ('' si no aplica)."""
+    años_restantes = np.asarray(edad_jubilacion) - np.asarray(edad)
+    nuevo_fondo = np.asarray(nuevo_fondo)
+    return np.select([(años_restantes < 10) & (nuevo_fondo == 'Crecimiento'),
+                      (años_restantes > 20) & (nuevo_fondo == 'Conservador')],
+                     [ADVERTENCIA_JUBILACION_CERCANA, ADVERTENCIA_HORIZONTE_LARGO], default='')
+
+
+def simular_cambios_fondo(afiliados, fondos, nuevo_fondo, aportacion=0.0, tasa_crecimiento=3.5):
+    """
+    Simula el cambio de cada afiliado de `afiliados` a `nuevo_fondo` (escalar o arreglo).
+
+    Devuelve por afiliado el fondo actual, los datos del fondo nuevo, la
+    pensión proyectada invirtiendo las aportaciones en cada fondo y la
+    advertencia del agente.
+    """
+    fondos = fondos.set_index(fondos['fondo'].astype(str))
+    neto = fondos['rendimiento_anual'] - fondos['comision']
+    nuevo_fondo = np.broadcast_to(np.asarray(nuevo_fondo, dtype=object), len(afiliados))
+    fondo_actual = afiliados['fondo_actual'].astype(str).to_numpy()
+    argumentos = (afiliados['edad'].to_numpy(), afiliados['salario'].to_numpy(),
+                  afiliados['años_cotizacion'].to_numpy(), aportacion, tasa_crecimiento,
+                  afiliados['edad_jubilacion'].to_numpy())
+    info = fondos.loc[nuevo_fondo]
+    pension_actual = proyeccion.pension_con_rendimiento(*argumentos, neto.loc[fondo_actual].to_numpy())
+    pension_nueva = proyeccion.pension_con_rendimiento(*argumentos, neto.loc[nuevo_fondo].to_numpy())
+    return pd.DataFrame({
+        'id': afiliados['id'].to_numpy(),
+        'fondo_actual': fondo_actual,
+        'nuevo_fondo': nuevo_fondo,
+        'rendimiento_anual': info['rendimiento_anual'].to_numpy(),
+        'riesgo': info['riesgo'].astype(str).to_numpy(),
+        'comision': info['comision'].to_numpy(),
+        'perfil_recomendado': info['perfil_recomendado'].astype(str).to_numpy(),
+        'pension_fondo_actual': pension_actual,
+        'pension_nuevo_fondo': pension_nueva,
+        'advertencia': advertencias_cambio_fondo(afiliados['edad'].to_numpy(), nuevo_fondo),
+    })
+
+
+class Dataset:
+    """
+    Tablas base cargadas una sola vez y compartidas por todas las peticiones.
+
+    Los afiliados son una vista de sólo lectura sobre la tabla compartida, así
+    que cada worker los mapea sin copiarlos aunque no se use ``--preload``.
+    """
+
+    def __init__(self):
+        almacen.asegurar_almacen()
+        self.version = almacen.version_datos()
+        grafo = perezoso.GrafoDatos()
+        self.afiliados = grafo.obtener('afiliados_completos', self.version)
+        self.fondos = grafo.obtener('fondos', self.version)
+        self.indice = grafo.obtener('indice_afiliados', self.version)
+        self.alertas = grafo.obtener('alertas', self.version)
+
+    def filas(self, ids):
+        """Filas de afiliados para `ids`; KeyError con los ids inexistentes."""
+        posiciones = [self.indice.posicion(i) for i in ids]
+        faltantes = [i for i, p in zip(ids, posiciones) if p is None]
+        if faltantes:
+            raise KeyError(faltantes)
+        return self.afiliados.iloc[posiciones]
+
+    def cumplimiento(self, ids):
+        """Reglas de cumplimiento que marcan a cada afiliado de `ids`, leídas de los mapas de bits."""
+        marcas = cumplimiento.marcas(self.alertas, [self.indice.posicion(i) for i in ids])
+        marcas.insert(0, 'id', list(ids))
+        return marcas
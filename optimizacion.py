@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Agente de optimización: mezcla de fondos recomendada para cada afiliado.
+
+Las mezclas candidatas combinan los fondos en pasos de `PASO_MEZCLA`. Cada
+mezcla tiene un rendimiento neto de comisión y una varianza (volatilidad por
+nivel de riesgo y una correlación común entre fondos); para un afiliado con
+aversión al riesgo γ se elige la que maximiza el rendimiento equivalente
+``μ - γ σ² / 2``. La aversión crece al acercarse la jubilación y baja cuando
+la pensión proyectada queda por debajo del 40% del salario, así que la
+mezcla recomendada se desplaza hacia el fondo conservador con la edad
+(trayectoria de jubilación).
+
+El óptimo sólo depende de γ: se calcula una vez la frontera de mezclas y
+cada afiliado se resuelve con una búsqueda binaria sobre sus puntos de
+quiebre, sin formar la matriz afiliados x mezclas. La solución se guarda en
+la tabla 'asignacion_fondos'; la corrida siguiente parte de ella, sólo
+recalcula a los afiliados cuyos datos cambiaron y conserva la mezcla previa
+si la nueva no la mejora en al menos `HISTERESIS`.
+
+Uso (ejecución nocturna):
+    python optimizacion.py
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+import almacen
+import ingesta
+import montecarlo
+import proyeccion
+
+
+TABLA_ASIGNACION = 'asignacion_fondos'
+PASO_MEZCLA = 0.25
+CORRELACION = 0.5
+AVERSION_MINIMA = 2.0
+AVERSION_MAXIMA = 12.0
+HORIZONTE_LARGO = 25  # años a partir de los cuales la aversión es la mínima
+HISTERESIS = 0.001  # mejora mínima del rendimiento equivalente (fracción anual) para cambiar de mezcla
+TASA_CRECIMIENTO = 3.5
+COLUMNAS_FIRMA = ['edad', 'salario', 'años_cotizacion', 'edad_jubilacion', 'pension_proyectada_base',
+                  'fondo_actual', 'aportacion']
+
+
+def mezclas(n_fondos, paso=PASO_MEZCLA):
+    """Pesos (mezclas x fondos) de todas las combinaciones en múltiplos de `paso` que suman 1."""
+    partes = int(round(1 / paso))
+    pesos = [combinacion for combinacion in itertools.product(range(partes + 1), repeat=n_fondos)
+             if sum(combinacion) == partes]
+    return np.array(pesos, dtype=float) / partes
+
+
+def parametros_mezclas(fondos, pesos, correlacion=CORRELACION):
+    """Rendimiento neto esperado y varianza (fracciones anuales) de cada mezcla."""
+    parametros = montecarlo.parametros_fondos(fondos)
+    mu = parametros['rendimiento_neto'].to_numpy() / 100
+    sigma = parametros['volatilidad'].to_numpy() / 100
+    covarianza = correlacion * np.outer(sigma, sigma)
+    np.fill_diagonal(covarianza, sigma ** 2)
+    return pesos @ mu, np.einsum('kf,fg,kg->k', pesos, covarianza, pesos)
+
+
+def frontera(mu, varianza):
+    """
+    Mezclas óptimas y sus puntos de quiebre en γ.
+
+    Devuelve ``(indices, quiebres)``: la mezcla ``indices[k]`` es la óptima
+    para ``quiebres[k-1] <= γ < quiebres[k]`` (la primera desde γ = 0).
+    """
+    actual = int(np.lexsort((varianza, -mu))[0])
+    indices, quiebres = [actual], []
+    while True:
+        menores = np.flatnonzero(varianza < varianza[actual] - 1e-15)
+        if not len(menores):
+            return np.array(indices), np.array(quiebres)
+        gammas = 2 * (mu[actual] - mu[menores]) / (varianza[actual] - varianza[menores])
+        # Entre empates en γ gana la de menor varianza: las intermedias nunca son óptimas
+        siguiente = menores[np.lexsort((varianza[menores], gammas))[0]]
+        quiebres.append(gammas.min())
+        indices.append(int(siguiente))
+        actual = siguiente
+
+
+def aversion(edad, edad_jubilacion, pension, salario):
+    """Aversión al riesgo γ por afiliado según su horizonte y su brecha de pensión."""
+    horizonte = np.clip((np.asarray(edad_jubilacion) - np.asarray(edad)) / HORIZONTE_LARGO, 0, 1)
+    gamma = AVERSION_MAXIMA - (AVERSION_MAXIMA - AVERSION_MINIMA) * horizonte
+    brecha = np.clip(1 - np.asarray(pension) / (np.asarray(salario) * proyeccion.PORCENTAJE_SUFICIENTE), 0, 1)
+    return gamma / (1 + brecha)
+
+
+def firmas(datos, fondos):
+    """Hash por afiliado de los datos que determinan su mezcla (incluye los parámetros de los fondos)."""
+    firma_fondos = pd.util.hash_pandas_object(montecarlo.parametros_fondos(fondos), index=True).sum()
+    return pd.util.hash_pandas_object(datos[COLUMNAS_FIRMA], index=False).to_numpy() ^ np.uint64(firma_fondos)
+
+
+def optimizar(datos, fondos, previa=None, histeresis=HISTERESIS, paso=PASO_MEZCLA):
+    """
+    Mezcla recomendada por afiliado.
+
+    `datos` necesita id, las columnas de `COLUMNAS_FIRMA` y la aportación
+    mensual; `previa` es una solución anterior de esta función (o None).
+    Lanza ValueError si algún fondo_actual no está en `fondos`.
+    Devuelve por afiliado la firma, el índice de mezcla, los pesos por fondo,
+    el fondo dominante, el rendimiento neto de la mezcla, la pensión proyectada con
+    el fondo actual y con la mezcla, y si se recalculó en esta corrida.
+    """
+    nombres = fondos['fondo'].astype(str).to_numpy()
+    pesos = mezclas(len(nombres), paso)
+    mu, varianza = parametros_mezclas(fondos, pesos)
+    indices, quiebres = frontera(mu, varianza)
+
+    firma = firmas(datos, fondos)
+    mezcla = np.full(len(datos), -1, dtype=np.int64)
+    mezcla_previa = mezcla.copy()
+    # Sólo se reutiliza si las mezclas son las mismas (mismos fondos y paso)
+    if previa is not None and len(previa) and previa['n_mezclas'].eq(len(pesos)).all():
+        # Lo habitual es la misma base en el mismo orden; sólo entonces se evita alinear por id
+        if np.array_equal(previa['id'].to_numpy(), datos['id'].to_numpy()):
+            posiciones = np.arange(len(datos))
+        else:
+            posiciones = pd.Index(previa['id']).get_indexer(datos['id'])
+        # -1: afiliado sin solución previa, se recalcula
+        con_previa = np.flatnonzero(posiciones >= 0)
+        mezcla_previa[con_previa] = previa['mezcla'].to_numpy()[posiciones[con_previa]]
+        vigentes = con_previa[previa['firma'].to_numpy()[posiciones[con_previa]] == firma[con_previa]]
+        mezcla[vigentes] = mezcla_previa[vigentes]
+
+    recalcular = np.flatnonzero(mezcla < 0)
+    gamma = aversion(datos['edad'].to_numpy()[recalcular], datos['edad_jubilacion'].to_numpy()[recalcular],
+                     datos['pension_proyectada_base'].to_numpy()[recalcular],
+                     datos['salario'].to_numpy()[recalcular])
+    optima = indices[np.searchsorted(quiebres, gamma, side='right')]
+    anterior = mezcla_previa[recalcular]
+    con_anterior = anterior >= 0
+    mejora = (mu[optima] - gamma * varianza[optima] / 2) - np.where(
+        con_anterior, mu[anterior] - gamma * varianza[anterior] / 2, -np.inf)
+    mezcla[recalcular] = np.where(con_anterior & (mejora < histeresis), anterior, optima)
+
+    fondo_actual = pd.Categorical(datos['fondo_actual'], categories=nombres)
+    if (fondo_actual.codes < 0).any():
+        desconocidos = sorted(set(datos['fondo_actual'].astype(str)[fondo_actual.codes < 0]))
+        raise ValueError(f"fondo_actual: fondos inexistentes {desconocidos}")
+    neto = montecarlo.parametros_fondos(fondos)['rendimiento_neto'].to_numpy()
+    argumentos = (datos['edad'].to_numpy(), datos['salario'].to_numpy(), datos['años_cotizacion'].to_numpy(),
+                  datos['aportacion'].to_numpy(), TASA_CRECIMIENTO, datos['edad_jubilacion'].to_numpy())
+    solucion = pd.DataFrame({
+        'id': datos['id'].to_numpy(),
+        'firma': firma,
+        'n_mezclas': len(pesos),
+        'mezcla': mezcla,
+        **{f'peso_{nombre}': pesos[mezcla, i] for i, nombre in enumerate(nombres)},
+        'fondo_actual': fondo_actual,
+        'fondo_recomendado': pd.Categorical.from_codes(pesos[mezcla].argmax(axis=1), nombres),
+        'rendimiento_mezcla': mu[mezcla] * 100,
+        'pension_fondo_actual': proyeccion.pension_con_rendimiento(*argumentos, neto[fondo_actual.codes]),
+        'pension_mezcla': proyeccion.pension_con_rendimiento(*argumentos, mu[mezcla] * 100),
+        'recalculado': np.isin(np.arange(len(datos)), recalcular),
+    })
+    return solucion
+
+
+def reasignaciones(solucion, fondos):
+    """Afiliados por fondo hoy y con la recomendación, y cuántos entran y salen de cada uno."""
+    nombres = fondos['fondo'].astype(str).to_numpy()
+    cambian = solucion['fondo_actual'] != solucion['fondo_recomendado']
+    return pd.DataFrame({
+        'fondo': nombres,
+        'afiliados_actuales': solucion['fondo_actual'].value_counts().reindex(nombres, fill_value=0).to_numpy(),
+        'afiliados_recomendados': solucion['fondo_recomendado'].value_counts().reindex(nombres, fill_value=0)
+                                  .to_numpy(),
+        'entran': solucion.loc[cambian, 'fondo_recomendado'].value_counts().reindex(nombres, fill_value=0)
+                  .to_numpy(),
+        'salen': solucion.loc[cambian, 'fondo_actual'].value_counts().reindex(nombres, fill_value=0).to_numpy(),
+    })
+
+
+def preparar_datos():
+    """Afiliados con su proyección y su aportación voluntaria mensual promedio del historial."""
+    afiliados = almacen.cargar_tabla('afiliados', columnas=['id', 'edad', 'salario', 'años_cotizacion',
+                                                            'fondo_actual'])
+    proyecciones = almacen.cargar_tabla('proyecciones', columnas=['id', 'edad_jubilacion',
+                                                                  'pension_proyectada_base'])
+    datos = afiliados.merge(proyecciones, on='id')
+    inicio, fin = almacen.rango_columna('transacciones', 'fecha')
+    meses = max((pd.Timestamp(fin) - pd.Timestamp(inicio)).days / 30.4, 1) if inicio is not None else 1
+    suma = ingesta.cargar_agregados().set_index('id_afiliado')['suma']
+    datos['aportacion'] = suma.reindex(datos['id'], fill_value=0).to_numpy() / meses
+    return datos
+
+
+def materializar():
+    """Optimiza la base actual partiendo de la última solución guardada y guarda la nueva."""
+    version = almacen.version_datos()
+    previa = almacen.cargar_tabla(TABLA_ASIGNACION) if almacen.version_tabla(TABLA_ASIGNACION) is not None \
+        else None
+    solucion = optimizar(preparar_datos(), almacen.cargar_tabla('fondos'), previa)
+    almacen.escribir_tabla(TABLA_ASIGNACION, solucion, version)
+    return solucion
+
+
+def cargar_asignacion():
+    """Solución de la versión actual de los datos; se recalcula (en caliente) si falta o está desfasada."""
+    if almacen.version_tabla(TABLA_ASIGNACION) != almacen.version_datos():
+        return materializar()
+    return almacen.cargar_tabla(TABLA_ASIGNACION)
+
+
+def main():
+    argparse.ArgumentParser(description="Calcula la mezcla de fondos recomendada para toda la base.").parse_args()
+    almacen.asegurar_almacen()
+    inicio = time.perf_counter()
+    solucion = materializar()
+    segundos = time.perf_counter() - inicio
+    print(f"{len(solucion):,} afiliados en {segundos:.2f} s "
+          f"({solucion['recalculado'].sum():,} recalculados)")
+    print(reasignaciones(solucion, almacen.cargar_tabla('fondos')).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Capa perezosa de tablas derivadas con dependencias entre ellas.
+
+Cada `Nodo` calcula una tabla (o un índice) a partir de sus dependencias. Un
+nodo sólo se calcula cuando una página lo pide y queda memorizado con la
+versión de los datos con la que se calculó; al cambiar la versión se
+recalcula la próxima vez que se pida. Si lo memorizado excede el límite de
+memoria se descartan primero los nodos usados hace más tiempo. Los nodos
+marcados como compartidos se leen de `compartido` y no cuentan para el límite.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+import almacen
+import atipicas
+import comportamiento
+import compartido
+import cumplimiento
+import indices
+import ingesta
+import instrumentacion
+import optimizacion
+from indices import IndiceAfiliados
+
+
+LIMITE_MEMORIA = int(os.environ.get('PENSIONISSSTE_LIMITE_MEMORIA', 1024 ** 3))
+
+
+@dataclass(frozen=True)
+class Nodo:
+    nombre: str
+    calcular: Callable[..., Any]
+    dependencias: Tuple[str, ...] = field(default=())
+    # Las tablas compartidas se mapean desde 'datos/compartido/' en lugar de vivir en la memoria del proceso
+    compartido: bool = False
+
+
+def _unir_afiliados(datos, afiliados, columnas):
+    return datos.merge(afiliados[['id'] + columnas], left_on='id_afiliado', right_on='id')
+
+
+NODOS = [
+    Nodo('afiliados', lambda: almacen.cargar_tabla('afiliados'), compartido=True),
+    Nodo('proyecciones', lambda: almacen.cargar_tabla('proyecciones')),
+    Nodo('fondos', lambda: almacen.cargar_tabla('fondos')),
+    # Las columnas 'tipo' y 'concepto' no se usan en ningún módulo
+    # Se ordenan por afiliado y fecha una sola vez por versión, antes de exportarlas: los índices de
+    # cada proceso mapean la tabla compartida ya ordenada en lugar de ordenar una copia privada
+    Nodo('transacciones', lambda: indices.ordenar_transacciones(
+        almacen.cargar_tabla('transacciones', columnas=['id_afiliado', 'fecha', 'monto'])), compartido=True),
+    Nodo('agregados', ingesta.cargar_agregados),
+    Nodo('alertas', cumplimiento.cargar_alertas),
+    Nodo('atipicas', atipicas.detectar_atipicas),
+    Nodo('asignacion_fondos', optimizacion.cargar_asignacion),
+    Nodo('afiliados_completos', lambda a, p: pd.merge(a, p, on='id'), ('afiliados', 'proyecciones'),
+         compartido=True),
+    Nodo('transacciones_analisis', lambda t, a: _unir_afiliados(t, a, ['nombre', 'edad', 'salario']),
+         ('transacciones', 'afiliados'), compartido=True),
+    Nodo('frecuencia_aportaciones',
+         lambda g, a: _unir_afiliados(g, a, ['nombre'])[['id_afiliado', 'nombre', 'n']]
+         .rename(columns={'n': 'aportaciones'}),
+         ('agregados', 'afiliados')),
+    Nodo('comportamiento', comportamiento.cargar_caracteristicas),
+    Nodo('hallazgos_comportamiento', comportamiento.hallazgos, ('comportamiento',)),
+    Nodo('frecuencia_edad', lambda c: comportamiento.frecuencia_por_banda(c, 'banda_edad'), ('comportamiento',)),
+    Nodo('frecuencia_salario', lambda c: comportamiento.frecuencia_por_banda(c, 'banda_salario'),
+         ('comportamiento',)),
+    Nodo('distribucion_fondos', lambda a: a['fondo_actual'].value_counts(), ('afiliados',)),
+    Nodo('indice_afiliados', IndiceAfiliados, ('afiliados_completos',)),
+    Nodo('indice_transacciones', IndiceAfiliados, ('afiliados_completos', 'transacciones')),
+]
+
+
+def tamaño(valor):
+    """Bytes aproximados que ocupa `valor` (DataFrame, Series, arreglo u objeto con atributos)."""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return int(np.sum(valor.memory_usage(deep=True)))
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if hasattr(valor, '__dict__'):
+        return sum(tamaño(atributo) for atributo in vars(valor).values())
+    return sys.getsizeof(valor)
+
+
+class GrafoDatos:
+    """Nodos memorizados por versión de los datos, con desalojo LRU bajo `limite_bytes`."""
+
+    def __init__(self, nodos=NODOS, limite_bytes=LIMITE_MEMORIA):
+        self.nodos = {nodo.nombre: nodo for nodo in nodos}
+        self.limite_bytes = limite_bytes
+        self.aciertos = 0
+        self.calculos = 0
+        self._memoria = OrderedDict()  # nombre -> (versión, valor, bytes, compartido), del menos al más reciente
+        # Las sesiones de Streamlit corren en hilos y comparten el grafo. `_candado` sólo protege la
+        # memoria; cada nodo se calcula bajo su propio candado para que un cálculo largo no bloquee
+        # las consultas a otros nodos (las dependencias forman un grafo acíclico: no hay interbloqueos).
+        self._candado = threading.Lock()
+        self._candados_nodo = {nombre: threading.Lock() for nombre in self.nodos}
+
+    def _memorizado(self, nombre, version):
+        with self._candado:
+            memorizado = self._memoria.get(nombre)
+            if memorizado is None or memorizado[0] != version:
+                return False, None
+            self._memoria.move_to_end(nombre)
+            self.aciertos += 1
+            return True, memorizado[1]
+
+    def obtener(self, nombre, version=None):
+        """Valor del nodo `nombre` en `version` (la actual si no se indica), calculándolo si hace falta."""
+        if version is None:
+            version = almacen.version_datos()
+        encontrado, valor = self._memorizado(nombre, version)
+        if not encontrado:
+            with self._candados_nodo[nombre]:
+                # Otra sesión pudo haberlo calculado mientras se esperaba el candado
+                encontrado, valor = self._memorizado(nombre, version)
+                if not encontrado:
+                    valor = self._calcular(nombre, version)
+        instrumentacion.registrar_cache(f'nodo:{nombre}', acierto=encontrado)
+        return valor
+
+    def _calcular(self, nombre, version):
+        nodo = self.nodos[nombre]
+
+        def calcular():
+            return nodo.calcular(*(self.obtener(dependencia, version) for dependencia in nodo.dependencias))
+
+        with instrumentacion.tramo(f'nodo:{nombre}', version=version):
+            valor = compartido.tabla(nombre, version, calcular) if nodo.compartido else calcular()
+        bytes_ = tamaño(valor)
+        with self._candado:
+            self.calculos += 1
+            self._memoria[nombre] = (version, valor, bytes_, nodo.compartido)
+            self._memoria.move_to_end(nombre)
+            self._desalojar(conservar=nombre)
+        return valor
+
+    def __getitem__(self, nombre):
+        return self.obtener(nombre)
+
+    def _desalojar(self, conservar):
+        # Sólo cuenta la memoria propia del proceso; las tablas compartidas viven en el caché del sistema
+        privados = [nombre for nombre, (_, _, _, es_compartido) in self._memoria.items() if not es_compartido]
+        total = sum(self._memoria[nombre][2] for nombre in privados)
+        for nombre in privados:
+            if total <= self.limite_bytes:
+                break
+            if nombre != conservar:
+                total -= self._memoria.pop(nombre)[2]
+
+    def memoria(self):
+        """Nodos memorizados con su versión y tamaño, del menos al más recientemente usado."""
+        with self._candado:
+            return pd.DataFrame([{'nodo': nombre, 'version': version, 'MB': bytes_ / 2**20,
+                                  'compartido': es_compartido}
+                                 for nombre, (version, _, bytes_, es_compartido) in self._memoria.items()],
+                                columns=['nodo', 'version', 'MB', 'compartido'])
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Motor vectorizado de proyección de pensiones.
+
+Reproduce la fórmula del "Simulador de Proyección de Pensión" sobre arreglos
+de NumPy para poder recalcular toda la base de afiliados en lote. Todas las
+funciones aceptan escalares o arreglos que se difunden entre sí.
+
+Uso en lote (escribe las proyecciones con el esquema de
+proyecciones_pensiones.csv y, con --curvas, la matriz de pensión por afiliado
+y edad en Parquet; cada afiliado conserva su edad de jubilación salvo que se
+indique --edad-jubilacion):
+    python proyeccion.py --salida proyecciones_nuevas.csv --tasa 3.5 --aportacion 0 --curvas curvas.parquet
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import almacen
+
+
+# Puntos porcentuales que se suman a la tasa de crecimiento en cada escenario
+ESCENARIOS = {
+    'pension_proyectada_base': 0.0,
+    'pension_optimista': 1.5,
+    'pension_pesimista': -1.5,
+}
+
+FACTOR_BASE = 0.05
+FACTOR_APORTACIONES = 1.03
+PORCENTAJE_SUFICIENTE = 0.4
+INCREMENTO_RECOMENDACION = 500
+TAMAÑO_BLOQUE = 1_000_000
+EDAD_JUBILACION = 65  # para afiliados sin proyección registrada
+
+
+def pension_base(salario, años_cotizacion):
+    return np.asarray(salario, dtype=float) * años_cotizacion * FACTOR_BASE
+
+
+def pension_aportaciones(aportacion, años_restantes):
+    return np.asarray(aportacion, dtype=float) * 12 * años_restantes * FACTOR_APORTACIONES
+
+
+def pension_proyectada(edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion):
+    """Pensión mensual proyectada a la edad de jubilación (tasa en %)."""
+    años_restantes = np.asarray(edad_jubilacion) - edad
+    return ((pension_base(salario, años_cotizacion) + pension_aportaciones(aportacion, años_restantes))
+            * (1 + (np.asarray(tasa_crecimiento) / 100 * años_restantes)))
+
+
+def saldo_aportaciones(aportacion, años_restantes, rendimiento):
+    """Saldo acumulado de aportaciones mensuales invertidas a `rendimiento` (% anual neto)."""
+    r = np.asarray(rendimiento, dtype=float) / 100
+    n = np.asarray(años_restantes, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where(np.abs(r) < 1e-12, n, np.expm1(n * np.log1p(r)) / r)
+    return np.asarray(aportacion, dtype=float) * 12 * factor
+
+
+def pension_con_rendimiento(edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion,
+                            rendimiento):
+    """
+    Pensión proyectada invirtiendo las aportaciones en un fondo con `rendimiento` neto.
+
+    La parte base crece con el salario como en el simulador; las aportaciones
+    se capitalizan año con año en el fondo. Es el valor esperado de la
+    simulación Monte Carlo cuando la volatilidad es cero.
+    """
+    años_restantes = np.asarray(edad_jubilacion) - edad
+    return (pension_base(salario, años_cotizacion) * (1 + np.asarray(tasa_crecimiento) / 100 * años_restantes)
+            + saldo_aportaciones(aportacion, años_restantes, rendimiento))
+
+
+def curva_proyeccion(edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion):
+    """
+    Proyección año por año para uno o varios afiliados.
+
+    Devuelve ``(edades, matriz)``: `edades` cubre de la menor edad actual a la
+    mayor edad de jubilación y ``matriz[i, j]`` es la pensión del afiliado i a
+    la edad ``edades[j]`` (NaN fuera de su rango edad..edad_jubilacion).
+    """
+    edad = np.atleast_1d(np.asarray(edad, dtype=np.int64))
+    edad_jubilacion = np.broadcast_to(np.asarray(edad_jubilacion, dtype=np.int64), edad.shape)
+    base = np.broadcast_to(pension_base(salario, años_cotizacion), edad.shape)[:, None]
+    aportacion = np.broadcast_to(np.asarray(aportacion, dtype=float), edad.shape)[:, None]
+    tasa = np.broadcast_to(np.asarray(tasa_crecimiento, dtype=float), edad.shape)[:, None]
+
+    edades = np.arange(edad.min(), edad_jubilacion.max() + 1)
+    transcurridos = (edades[None, :] - edad[:, None]).astype(float)
+    matriz = base * (1 + tasa / 100 * transcurridos) + pension_aportaciones(aportacion, transcurridos)
+    fuera_de_rango = (transcurridos < 0) | (edades[None, :] > edad_jubilacion[:, None])
+    matriz[fuera_de_rango] = np.nan
+    return edades, matriz
+
+
+def columnas_curva(edades):
+    """Nombre de la columna de la matriz de curvas para cada edad."""
+    return [f'edad_{edad}' for edad in edades]
+
+
+def curvas_bloque(afiliados, aportacion, tasa_crecimiento, edad_jubilacion, edades):
+    """
+    Matriz de curvas de un bloque de afiliados como tabla ancha.
+
+    Una fila por afiliado con su id y una columna por cada edad de `edades`
+    (rango común a todos los bloques); NaN fuera de edad..edad_jubilacion.
+    """
+    desde, matriz = curva_proyeccion(afiliados['edad'].to_numpy(), afiliados['salario'].to_numpy(),
+                                     afiliados['años_cotizacion'].to_numpy(), aportacion, tasa_crecimiento,
+                                     edad_jubilacion)
+    completa = np.full((len(afiliados), len(edades)), np.nan)
+    if len(desde):  # vacío si todo el bloque ya rebasó la edad de jubilación
+        inicio = int(desde[0] - edades[0])
+        completa[:, inicio:inicio + len(desde)] = matriz
+    curvas = pd.DataFrame(completa.round(2), columns=columnas_curva(edades))
+    curvas.insert(0, 'id', afiliados['id'].to_numpy())
+    return curvas
+
+
+def recomendacion_aportacion(edad, salario, años_cotizacion, aportacion, tasa_crecimiento, edad_jubilacion):
+    """Texto de recomendación con el incremento mensual para alcanzar el 40% del salario."""
+    años_restantes = np.asarray(edad_jubilacion) - edad
+    crecimiento = 1 + np.asarray(tasa_crecimiento) / 100 * años_restantes
+    with np.errstate(divide='ignore', invalid='ignore'):
+        requerida = ((PORCENTAJE_SUFICIENTE * np.asarray(salario) / crecimiento
+                      - pension_base(salario, años_cotizacion))
+                     / (12 * años_restantes * FACTOR_APORTACIONES))
+    incremento = np.ceil((requerida - aportacion) / INCREMENTO_RECOMENDACION) * INCREMENTO_RECOMENDACION
+    incremento = np.where((años_restantes > 0) & np.isfinite(incremento), incremento, 0)
+    incremento = np.atleast_1d(incremento)
+    return np.where(incremento > 0,
+                    pd.Series(incremento.astype(np.int64)).map('Aumentar {} mensuales'.format).to_numpy(),
+                    'Mantener aportación')
+
+
+def proyectar_bloque(afiliados, aportacion, tasa_crecimiento, edad_jubilacion):
+    """Tabla con el esquema de proyecciones_pensiones.csv para un bloque de afiliados."""
+    argumentos = (afiliados['edad'].to_numpy(), afiliados['salario'].to_numpy(),
+                  afiliados['años_cotizacion'].to_numpy(), aportacion)
+    proyecciones = pd.DataFrame({
+        'id': afiliados['id'].to_numpy(),
+        'edad_jubilacion': np.broadcast_to(edad_jubilacion, len(afiliados)),
+    })
+    for columna, delta in ESCENARIOS.items():
+        proyecciones[columna] = pension_proyectada(*argumentos, tasa_crecimiento + delta, edad_jubilacion).round(2)
+    proyecciones['recomendacion_aportacion'] = recomendacion_aportacion(*argumentos, tasa_crecimiento, edad_jubilacion)
+    return proyecciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula las proyecciones de toda la base de afiliados.")
+    parser.add_argument('--aportacion', type=float, default=0.0, help="Aportación voluntaria mensual ($)")
+    parser.add_argument('--tasa', type=float, default=3.5, help="Tasa de crecimiento salarial anual (%%)")
+    parser.add_argument('--edad-jubilacion', type=int,
+                        help="Misma edad para todos; por omisión la de cada afiliado en sus proyecciones")
+    parser.add_argument('--salida', required=True,
+                        help="CSV de salida (no se sobrescribe proyecciones_pensiones.csv por omisión)")
+    parser.add_argument('--curvas', help="Parquet donde guardar la curva año por año de cada afiliado")
+    parser.add_argument('--tamaño-bloque', type=int, default=TAMAÑO_BLOQUE)
+    args = parser.parse_args()
+
+    almacen.asegurar_almacen()
+    temporal = args.salida + '.tmp'
+    total = 0
+    columnas = ['id', 'edad', 'salario', 'años_cotizacion']
+    if args.edad_jubilacion is None:
+        # Sólo dos columnas de proyecciones: la edad de jubilación de cada afiliado
+        jubilacion = almacen.cargar_tabla('proyecciones', columnas=['id', 'edad_jubilacion']).set_index('id')
+        jubilacion = jubilacion['edad_jubilacion']
+        jubilacion_minima, jubilacion_maxima = int(jubilacion.min()), int(jubilacion.max())
+    else:
+        jubilacion_minima = jubilacion_maxima = args.edad_jubilacion
+    escritor = None
+    if args.curvas:
+        # Todas las partes del Parquet comparten columnas: de la menor edad de la base a la jubilación
+        edad_minima, edad_maxima = almacen.rango_columna('afiliados', 'edad')
+        edades = np.arange(min(int(edad_minima), jubilacion_minima, EDAD_JUBILACION),
+                           max(int(edad_maxima), jubilacion_maxima, EDAD_JUBILACION) + 1)
+        esquema = pa.schema([('id', pa.int64())] + [(c, pa.float64()) for c in columnas_curva(edades)])
+        escritor = pq.ParquetWriter(args.curvas + '.tmp', esquema)
+    try:
+        for bloque in almacen.iterar_lotes('afiliados', columnas=columnas, tamaño_lote=args.tamaño_bloque):
+            if args.edad_jubilacion is None:
+                edad_jubilacion = jubilacion.reindex(bloque['id']).fillna(EDAD_JUBILACION).to_numpy(dtype=np.int64)
+            else:
+                edad_jubilacion = args.edad_jubilacion
+            proyecciones = proyectar_bloque(bloque, args.aportacion, args.tasa, edad_jubilacion)
+            proyecciones.to_csv(temporal, mode='a' if total else 'w', header=not total, index=False)
+            if escritor is not None:
+                curvas = curvas_bloque(bloque, args.aportacion, args.tasa, edad_jubilacion, edades)
+                escritor.write_table(pa.Table.from_pandas(curvas, schema=esquema, preserve_index=False))
+            total += len(proyecciones)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    os.replace(temporal, args.salida)
+    print(f"{total:,} proyecciones escritas en {args.salida}")
+    if args.curvas:
+        os.replace(args.curvas + '.tmp', args.curvas)
+        print(f"Curvas de {edades[0]} a {edades[-1]} años escritas en {args.curvas}")
+
+
+if __name__ == '__main__':
+    main()
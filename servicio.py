@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio HTTP sin Streamlit para los cálculos de los agentes.
+
+Expone en lote la proyección de pensiones, la simulación de cambio de fondo
+y las pruebas de cumplimiento para el centro de atención y los sistemas por
+lotes. El dataset se carga al importar el módulo; con ``--preload`` gunicorn
+lo carga una vez antes de crear los workers y éstos lo comparten por
+copy-on-write. Cada petición revisa la versión de los datos y, si cambió
+(p. ej. después de ``ingesta.py``), el worker recarga el dataset sin
+reiniciarse:
+
+    gunicorn servicio:app -k uvicorn.workers.UvicornWorker -w 4 --preload
+
+Para desarrollo basta ``uvicorn servicio:app``.
+"""
+
+import json
+import threading
+from typing import List, Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+import almacen
+import nucleo
+import proyeccion
+
+
+_dataset = nucleo.Dataset()
+_candado = threading.Lock()
+
+app = FastAPI(title="AFORE PENSIONISSSTE - Agentes Inteligentes")
+
+
+class Perfil(BaseModel):
+    edad: int = Field(ge=18, le=100)
+    salario: float = Field(gt=0)
+    años_cotizacion: int = Field(ge=0, le=60)
+    aportacion: float = Field(0.0, ge=0)
+    tasa_crecimiento: float = 3.5
+    edad_jubilacion: int = Field(65, ge=50, le=100)
+
+
+class SolicitudProyeccion(BaseModel):
+    perfiles: List[Perfil]
+    curva: bool = False
+
+
+class CambioFondo(BaseModel):
+    id_afiliado: int
+    nuevo_fondo: str
+
+
+class SolicitudCambioFondo(BaseModel):
+    cambios: List[CambioFondo]
+    aportacion: float = Field(0.0, ge=0)
+    tasa_crecimiento: float = 3.5
+
+
+class SolicitudCumplimiento(BaseModel):
+    ids: Optional[List[int]] = None
+
+
+def _registros(datos):
+    """Filas de un DataFrame como objetos JSON (convierte tipos de NumPy y fechas)."""
+    return json.loads(datos.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+def dataset():
+    """Dataset de la versión actual de los datos; se recarga cuando la versión cambia."""
+    global _dataset
+    if _dataset.version != almacen.version_datos():
+        with _candado:
+            if _dataset.version != almacen.version_datos():
+                _dataset = nucleo.Dataset()
+    return _dataset
+
+
+def _filas(datos, ids):
+    try:
+        return datos.filas(ids)
+    except KeyError as error:
+        raise HTTPException(status_code=404, detail=f"Afiliados inexistentes: {error.args[0]}")
+
+
+@app.get("/salud")
+def salud():
+    datos = dataset()
+    return {'estado': 'ok', 'version_datos': datos.version, 'afiliados': len(datos.afiliados)}
+
+
+@app.get("/afiliados/{id_afiliado}")
+def afiliado(id_afiliado: int):
+    return _registros(_filas(dataset(), [id_afiliado]))[0]
+
+
+@app.post("/proyecciones")
+def proyecciones(solicitud: SolicitudProyeccion):
+    """Pensión proyectada (y opcionalmente la curva año por año) para cada perfil."""
+    columnas = {campo: np.array([getattr(p, campo) for p in solicitud.perfiles])
+                for campo in Perfil.model_fields}
+    argumentos = (columnas['edad'], columnas['salario'], columnas['años_cotizacion'], columnas['aportacion'],
+                  columnas['tasa_crecimiento'], columnas['edad_jubilacion'])
+    pensiones = proyeccion.pension_proyectada(*argumentos)
+    respuesta = [{'pension_proyectada': float(p)} for p in pensiones]
+    if solicitud.curva and respuesta:
+        edades, matriz = proyeccion.curva_proyeccion(*argumentos)
+        for fila, valores in zip(respuesta, matriz):
+            validos = ~np.isnan(valores)
+            fila['curva'] = {'edades': edades[validos].tolist(), 'pensiones': valores[validos].tolist()}
+    return {'proyecciones': respuesta}
+
+
+@app.post("/cambios-fondo")
+def cambios_fondo(solicitud: SolicitudCambioFondo):
+    """Simulación de cambio de fondo con advertencias del agente, por afiliado."""
+    datos = dataset()
+    nuevos = [c.nuevo_fondo for c in solicitud.cambios]
+    desconocidos = sorted(set(nuevos) - set(datos.fondos['fondo'].astype(str)))
+    if desconocidos:
+        raise HTTPException(status_code=422, detail=f"Fondos inexistentes: {desconocidos}")
+    filas = _filas(datos, [c.id_afiliado for c in solicitud.cambios])
+    simulacion = nucleo.simular_cambios_fondo(filas, datos.fondos, nuevos, solicitud.aportacion,
+                                              solicitud.tasa_crecimiento)
+    return {'cambios': _registros(simulacion)}
+
+
+@app.post("/cumplimiento")
+def cumplimiento(solicitud: SolicitudCumplimiento):
+    """Reglas de cumplimiento por afiliado, o el resumen de alertas si no se indican ids."""
+    datos = dataset()
+    if not solicitud.ids:
+        return {'alertas': _registros(datos.alertas.drop(columns='mapa_bits'))}
+    _filas(datos, solicitud.ids)
+    return {'afiliados': _registros(datos.cumplimiento(solicitud.ids))}
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Generador sintético y reproducible de afiliados, proyecciones, fondos y transacciones.
+
+Produce datos con las mismas columnas que los CSV del sistema y relaciones
+plausibles entre ellas (salario según escolaridad, fondo según edad, menor
+frecuencia de aportaciones después de los 50 años, afiliados inactivos y
+aportaciones atípicas ocasionales). Genera por bloques de afiliados, así que
+la memoria no depende del tamaño total, y escribe los CSV y/o el almacén
+Parquet en `--directorio` ('datos_sinteticos/' por omisión, para no
+sobrescribir los CSV del repositorio).
+
+Uso:
+    python sintetico.py --afiliados 1000000 --directorio /tmp/pensiones --formatos csv parquet
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import almacen
+import esquema
+
+
+NOMBRES = np.array(['Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Sofía', 'Jorge', 'Patricia', 'Fernando',
+                    'Adriana', 'José', 'Guadalupe', 'Miguel', 'Verónica', 'Ricardo', 'Laura', 'Alejandro',
+                    'Gabriela', 'Roberto', 'Claudia'])
+APELLIDOS = np.array(['Pérez', 'García', 'López', 'Martínez', 'Ramírez', 'Díaz', 'Cruz', 'Ruiz', 'Vázquez',
+                      'Soto', 'Hernández', 'González', 'Rodríguez', 'Sánchez', 'Flores', 'Morales', 'Reyes',
+                      'Jiménez', 'Torres', 'Mendoza'])
+ESCOLARIDAD = np.array(['Secundaria', 'Preparatoria', 'Universidad', 'Posgrado'])
+SALARIO_POR_ESCOLARIDAD = np.array([14000, 20000, 30000, 45000])
+FONDOS = pd.DataFrame({
+    'fondo': ['Conservador', 'Balanceado', 'Crecimiento'],
+    'rendimiento_anual': [4.5, 6.8, 8.2],
+    'riesgo': ['Bajo', 'Medio', 'Alto'],
+    'comision': [0.8, 1.2, 1.5],
+    'perfil_recomendado': ['Jubilación cercana', 'Jubilación media', 'Jubilación lejana'],
+    'rentabilidad_5años': [24.6, 39.1, 48.3],
+})
+
+INICIO_HISTORIAL = pd.Timestamp('2023-01-01')
+DIAS_HISTORIAL = 730
+FILAS_POR_BLOQUE = 1_000_000
+DIRECTORIO_SALIDA = 'datos_sinteticos'
+
+
+def generar_afiliados(rng, ids):
+    """Afiliados con los `ids` dados (arreglo de enteros)."""
+    n = len(ids)
+    edad = np.clip(rng.triangular(22, 40, 68, n).astype(np.int64), 22, 67)
+    años_cotizacion = np.minimum(rng.integers(1, 41, n), edad - 20).clip(1)
+    nivel = rng.choice(len(ESCOLARIDAD), n, p=[0.25, 0.35, 0.32, 0.08])
+    salario = np.round(SALARIO_POR_ESCOLARIDAD[nivel] * rng.lognormal(0, 0.35, n) * (1 + años_cotizacion / 60),
+                       -2).astype(np.int64)
+    estado_civil = np.where(edad < 30, rng.choice(['Soltero', 'Casado'], n, p=[0.7, 0.3]),
+                            rng.choice(['Casado', 'Soltero', 'Divorciado', 'Viudo'], n, p=[0.6, 0.2, 0.15, 0.05]))
+    # El fondo tiende a volverse más conservador con la edad, con un 15% de asignaciones "inadecuadas"
+    fondo_por_edad = np.select([edad < 40, edad < 55], ['Crecimiento', 'Balanceado'], 'Conservador')
+    fondo_actual = np.where(rng.random(n) < 0.15, rng.choice(FONDOS['fondo'], n), fondo_por_edad)
+    return pd.DataFrame({
+        'id': ids,
+        'nombre': np.char.add(np.char.add(rng.choice(NOMBRES, n), ' '), rng.choice(APELLIDOS, n)),
+        'edad': edad,
+        'salario': salario,
+        'años_cotizacion': años_cotizacion,
+        'estado_civil': estado_civil,
+        'hijos': np.minimum(rng.poisson(np.where(edad < 30, 0.4, 1.6)), 6),
+        'escolaridad': ESCOLARIDAD[nivel],
+        'riesgo_pension_insuficiente': 'Bajo',
+        'fondo_actual': fondo_actual,
+    })
+
+
+def generar_proyecciones(rng, afiliados):
+    """Proyecciones por afiliado; también fija su `riesgo_pension_insuficiente`."""
+    n = len(afiliados)
+    tasa_reemplazo = np.clip(0.22 + 0.014 * afiliados['años_cotizacion'].to_numpy() + rng.normal(0, 0.08, n),
+                             0.1, 1.0)
+    base = np.round(afiliados['salario'].to_numpy() * tasa_reemplazo, -2).astype(np.int64)
+    afiliados['riesgo_pension_insuficiente'] = np.select([tasa_reemplazo < 0.35, tasa_reemplazo < 0.5],
+                                                         ['Alto', 'Medio'], 'Bajo')
+    faltante = np.ceil((0.5 - tasa_reemplazo) * afiliados['salario'].to_numpy() / 10 / 500) * 500
+    recomendacion = np.where(faltante > 0,
+                             pd.Series(np.maximum(faltante, 0).astype(np.int64))
+                             .map('Aumentar {} mensuales'.format).to_numpy(),
+                             'Mantener aportación')
+    return pd.DataFrame({
+        'id': afiliados['id'].to_numpy(),
+        'edad_jubilacion': np.where(rng.random(n) < 0.85, 65, rng.integers(60, 71, n)),
+        'pension_proyectada_base': base,
+        'pension_optimista': np.round(base * 1.16, -2).astype(np.int64),
+        'pension_pesimista': np.round(base * 0.84, -2).astype(np.int64),
+        'recomendacion_aportacion': recomendacion,
+    })
+
+
+def generar_transacciones(rng, afiliados, por_afiliado=10):
+    """Aportaciones voluntarias de `afiliados`, con `por_afiliado` aportaciones en promedio."""
+    edad = afiliados['edad'].to_numpy()
+    salario = afiliados['salario'].to_numpy()
+    intensidad = por_afiliado * np.where(edad > 50, 0.6, 1.0) * np.clip(salario / 30000, 0.4, 2.0)
+    conteos = rng.poisson(intensidad)
+    ids = np.repeat(afiliados['id'].to_numpy(), conteos)
+    # Un 10% de afiliados dejó de aportar en algún momento del historial
+    fin_actividad = np.where(rng.random(len(edad)) < 0.1, rng.integers(60, DIAS_HISTORIAL, len(edad)),
+                             DIAS_HISTORIAL)
+    dias = (rng.random(len(ids)) * np.repeat(fin_actividad, conteos)).astype(np.int64)
+    monto = np.round(np.repeat(salario, conteos) * 0.05 * rng.lognormal(0, 0.3, len(ids)), -1)
+    atipica = rng.random(len(ids)) < 0.01
+    monto[atipica] *= rng.uniform(4, 8, atipica.sum())
+    orden = np.lexsort((dias, ids))
+    return pd.DataFrame({
+        'id_afiliado': ids[orden],
+        'fecha': INICIO_HISTORIAL + pd.to_timedelta(dias[orden], unit='D'),
+        'monto': monto[orden].astype(np.int64),
+        'tipo': 'Aportación',
+        'concepto': 'Voluntaria',
+    })
+
+
+def generar_bloques(n_afiliados, por_afiliado=10, semilla=0, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Genera ``(afiliados, proyecciones, transacciones)`` por bloques de afiliados."""
+    semillas = np.random.SeedSequence(semilla).spawn(-(-n_afiliados // filas_por_bloque))
+    for semilla_bloque, inicio in zip(semillas, range(0, n_afiliados, filas_por_bloque)):
+        rng = np.random.default_rng(semilla_bloque)
+        afiliados = generar_afiliados(rng, np.arange(inicio + 1, min(inicio + filas_por_bloque, n_afiliados) + 1))
+        proyecciones = generar_proyecciones(rng, afiliados)
+        yield afiliados, proyecciones, generar_transacciones(rng, afiliados, por_afiliado)
+
+
+def _fechas_csv(fechas):
+    # Hay pocas fechas distintas: se formatean una vez cada una en lugar de fila por fila
+    codigos, unicas = pd.factorize(fechas)
+    return unicas.strftime('%d/%m/%Y').to_numpy()[codigos]
+
+
+def generar(n_afiliados, por_afiliado=10, semilla=0, formatos=('csv', 'parquet'),
+            filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Escribe las cuatro tablas como CSV y/o almacén Parquet en el directorio de trabajo.
+
+    Los nombres son los de `almacen.ARCHIVOS_CSV` y `almacen.DIRECTORIO_DATOS`,
+    así que llamarla desde la raíz del repositorio reemplaza sus CSV; el CLI
+    cambia antes a `--directorio`.
+    """
+    escritores = {}
+
+    def escribir(tabla, bloque, primero):
+        if 'csv' in formatos:
+            csv = bloque.assign(fecha=_fechas_csv(bloque['fecha'])) if 'fecha' in bloque else bloque
+            csv.to_csv(almacen.ARCHIVOS_CSV[tabla], mode='w' if primero else 'a', header=primero, index=False)
+        if 'parquet' in formatos:
+            lote = esquema.tipar(tabla, bloque)
+            if tabla not in escritores:
+                ruta = almacen.ruta_tabla(tabla)
+                os.makedirs(ruta, exist_ok=True)
+                for parte in os.listdir(ruta):
+                    os.remove(os.path.join(ruta, parte))
+                escritores[tabla] = pq.ParquetWriter(os.path.join(ruta, 'parte-00000.parquet'), lote.schema)
+            escritores[tabla].write_table(lote.cast(escritores[tabla].schema),
+                                          row_group_size=almacen.FILAS_POR_GRUPO)
+
+    try:
+        escribir('fondos', FONDOS, True)
+        for numero, bloques in enumerate(generar_bloques(n_afiliados, por_afiliado, semilla, filas_por_bloque)):
+            for tabla, bloque in zip(['afiliados', 'proyecciones', 'transacciones'], bloques):
+                escribir(tabla, bloque, numero == 0)
+    finally:
+        # Los Parquet se cierran después de escribir los CSV para que no parezcan desactualizados
+        for escritor in escritores.values():
+            escritor.close()
+    if 'parquet' in formatos:
+        almacen.incrementar_version()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos con el esquema del sistema.")
+    parser.add_argument('--afiliados', type=int, default=1000)
+    parser.add_argument('--transacciones-por-afiliado', type=float, default=10)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--directorio', default=DIRECTORIO_SALIDA,
+                        help="Directorio de salida; no debe ser la raíz del repositorio")
+    parser.add_argument('--formatos', nargs='+', choices=['csv', 'parquet'], default=['csv', 'parquet'])
+    parser.add_argument('--filas-por-bloque', type=int, default=FILAS_POR_BLOQUE)
+    args = parser.parse_args()
+
+    if os.path.realpath(args.directorio) == os.path.dirname(os.path.realpath(__file__)):
+        parser.error("--directorio no puede ser la raíz del repositorio: sobrescribiría sus CSV")
+    os.makedirs(args.directorio, exist_ok=True)
+    os.chdir(args.directorio)
+    generar(args.afiliados, args.transacciones_por_afiliado, args.semilla, args.formatos, args.filas_por_bloque)
+    print(f"{args.afiliados:,} afiliados generados en {os.getcwd()} ({', '.join(args.formatos)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Tablas paginadas: se ordena y filtra en el servidor y sólo se envía la página visible.
+
+`TablaOrdenable` precalcula, por columna, el orden (argsort), el rango de
+cada fila dentro de ese orden y los valores ya ordenados. Con eso una página
+sin filtros es un corte del orden, y los filtros por igualdad o por prefijo
+son búsquedas binarias sobre los valores ordenados.
+"""
+
+import numpy as np
+import streamlit as st
+
+import instrumentacion
+
+
+TAMAÑO_PAGINA = 50
+TODOS = "(Todos)"
+
+
+class TablaOrdenable:
+    """Índices de orden precalculados sobre `datos` para las `columnas` indicadas."""
+
+    def __init__(self, datos, columnas):
+        self.datos = datos.reset_index(drop=True)
+        self.ordenes, self.rangos, self.ordenados, self.categorias = {}, {}, {}, {}
+        for columna in columnas:
+            serie = self.datos[columna]
+            if serie.dtype == 'category':
+                serie = serie.astype(str)
+                self.categorias[columna] = sorted(self.datos[columna].cat.categories.astype(str))
+            orden = serie.argsort(kind='stable').to_numpy()
+            rango = np.empty_like(orden)
+            rango[orden] = np.arange(len(orden))
+            self.ordenes[columna] = orden
+            self.rangos[columna] = rango
+            self.ordenados[columna] = serie.to_numpy()[orden]
+
+    def __len__(self):
+        return len(self.datos)
+
+    def _rango_valores(self, columna, valor, prefijo):
+        ordenados = self.ordenados[columna]
+        inicio = np.searchsorted(ordenados, valor, side='left')
+        fin = np.searchsorted(ordenados, valor + '\uffff' if prefijo else valor, side='right')
+        return self.ordenes[columna][inicio:fin]
+
+    def posiciones(self, filtros):
+        """
+        Filas que cumplen todos los `filtros` (None si no hay filtros activos).
+
+        `filtros` asocia columna -> valor; en columnas categóricas se compara por
+        igualdad y en las de texto libre se busca por prefijo.
+        """
+        posiciones = None
+        for columna, valor in filtros.items():
+            if valor in (None, '', TODOS):
+                continue
+            coincidencias = self._rango_valores(columna, valor, prefijo=columna not in self.categorias)
+            if posiciones is None:
+                posiciones = coincidencias
+            else:
+                posiciones = np.intersect1d(posiciones, coincidencias, assume_unique=True)
+        return posiciones
+
+    def pagina_de(self, posiciones, ordenar_por, descendente=False, numero=1, tamaño=TAMAÑO_PAGINA):
+        """Filas de la página `numero` de `posiciones` (None = todas) en el orden pedido."""
+        orden = self.ordenes[ordenar_por]
+        if posiciones is not None and len(posiciones) * 16 < len(orden):
+            orden = posiciones[np.argsort(self.rangos[ordenar_por][posiciones], kind='stable')]
+        elif posiciones is not None:
+            # Con muchas coincidencias es más barato recorrer el orden completo con una máscara
+            mascara = np.zeros(len(orden), dtype=bool)
+            mascara[posiciones] = True
+            orden = orden[mascara[orden]]
+        if descendente:
+            orden = orden[::-1]
+        inicio = (numero - 1) * tamaño
+        return self.datos.iloc[orden[inicio:inicio + tamaño]]
+
+    def pagina(self, ordenar_por, descendente=False, filtros=None, numero=1, tamaño=TAMAÑO_PAGINA):
+        """Devuelve ``(filas de la página, total de filas filtradas)``."""
+        posiciones = self.posiciones(filtros or {})
+        total = len(self) if posiciones is None else len(posiciones)
+        return self.pagina_de(posiciones, ordenar_por, descendente, numero, tamaño), total
+
+
+@instrumentacion.medida('tabla.tabla_paginada')
+def tabla_paginada(tabla, clave, columnas=None, filtros=(), tamaño=TAMAÑO_PAGINA):
+    """
+    Muestra `tabla` paginada con controles de orden y filtro.
+
+    `filtros` son las columnas por las que se puede filtrar; `clave` distingue
+    los widgets cuando hay varias tablas en la misma página.
+    """
+    controles = st.columns(2 + len(filtros))
+    with controles[0]:
+        ordenar_por = st.selectbox("Ordenar por", list(tabla.ordenes), key=f"{clave}_orden")
+    with controles[1]:
+        descendente = st.checkbox("Descendente", key=f"{clave}_descendente")
+    valores = {}
+    for control, columna in zip(controles[2:], filtros):
+        with control:
+            if columna in tabla.categorias:
+                valores[columna] = st.selectbox(columna, [TODOS] + tabla.categorias[columna],
+                                                key=f"{clave}_{columna}")
+            else:
+                valores[columna] = st.text_input(f"{columna} comienza con", key=f"{clave}_{columna}")
+
+    posiciones = tabla.posiciones(valores)
+    total = len(tabla) if posiciones is None else len(posiciones)
+    paginas = max(1, -(-total // tamaño))
+    # Volver a la primera página cuando cambian el orden o los filtros
+    firma = (ordenar_por, descendente, tuple(valores.items()))
+    if st.session_state.get(f"{clave}_firma") != firma or st.session_state.get(f"{clave}_pagina", 1) > paginas:
+        st.session_state[f"{clave}_firma"] = firma
+        st.session_state[f"{clave}_pagina"] = 1
+    numero = st.number_input(f"Página (de {paginas:,})", min_value=1, max_value=paginas, key=f"{clave}_pagina")
+    filas = tabla.pagina_de(posiciones, ordenar_por, descendente, numero, tamaño)
+    st.dataframe(filas[columnas] if columnas else filas)
+    st.caption(f"Mostrando {min((numero - 1) * tamaño + 1, total):,}–{min(numero * tamaño, total):,} "
+               f"de {total:,} registros")
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import almacen
+import ingesta
+import sintetico
+
+
+def test_reconvertir_csv_conserva_lotes_ingeridos(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sintetico.generar(20, por_afiliado=5, formatos=('csv',))
+    almacen.asegurar_almacen()
+    originales = almacen.contar_filas('transacciones')
+
+    ingesta.ingerir_lote(pd.DataFrame({
+        'id_afiliado': [1, 2], 'fecha': ['01/03/2025', '02/03/2025'], 'monto': [500.0, 750.0],
+        'tipo': 'Aportación', 'concepto': 'Voluntaria',
+    }))
+    assert almacen.contar_filas('transacciones') == originales + 2
+
+    # La conversión queda más antigua que el CSV: se reconvierte sin perder el lote ingerido
+    parte = os.path.join(almacen.ruta_tabla('transacciones'), 'parte-00000.parquet')
+    os.utime(parte, (0, os.path.getmtime(almacen.ARCHIVOS_CSV['transacciones']) - 60))
+    assert almacen.requiere_conversion('transacciones')
+    almacen.asegurar_almacen()
+    assert not almacen.requiere_conversion('transacciones')
+    assert almacen.contar_filas('transacciones') == originales + 2
+    assert ingesta.cargar_agregados()['n'].sum() == originales + 2
+
+
+def test_sesiones_concurrentes_convierten_una_vez(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sintetico.generar(20, por_afiliado=5, formatos=('csv',))
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: almacen.asegurar_almacen(), range(8)))
+    assert almacen.version_datos() == len(almacen.ARCHIVOS_CSV)
+    assert not [f for _, _, archivos in os.walk(almacen.DIRECTORIO_DATOS) for f in archivos if f.endswith('.tmp')]
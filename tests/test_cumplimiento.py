@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import almacen
+import cumplimiento
+import sintetico
+
+CAMBIO = "Cambios bruscos en salario"
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sintetico.generar(50, por_afiliado=3, formatos=('csv',))
+    almacen.asegurar_almacen()
+
+
+def _marcados(alertas):
+    return cumplimiento.posiciones_marcadas(alertas, CAMBIO, 50).tolist()
+
+
+def _cambiar_salarios(factores):
+    csv = almacen.ARCHIVOS_CSV['afiliados']
+    afiliados = pd.read_csv(csv)
+    for posicion, factor in factores.items():
+        afiliados.loc[posicion, 'salario'] = round(afiliados.loc[posicion, 'salario'] * factor)
+    afiliados.to_csv(csv, index=False)
+    parte = os.path.join(almacen.ruta_tabla('afiliados'), 'parte-00000.parquet')
+    os.utime(parte, (0, os.path.getmtime(csv) - 60))
+    almacen.asegurar_almacen()
+
+
+def test_primera_corrida_sin_alertas_ni_escrituras(base):
+    alertas = cumplimiento.cargar_alertas()
+    assert _marcados(alertas) == []
+    # Evaluar las reglas no registra salarios: eso sólo ocurre al convertir afiliados.csv
+    assert almacen.version_tabla(almacen.TABLA_HISTORIAL_SALARIOS) is None
+
+
+def test_cambio_detectado_en_la_ingesta_y_expira(base):
+    _cambiar_salarios({0: 2.0, 1: 1.1})
+    cambio = almacen.cargar_tabla(almacen.TABLA_HISTORIAL_SALARIOS)['fecha_cambio'].max()
+
+    # La primera evaluación después del cambio ya tiene con qué comparar
+    assert _marcados(cumplimiento.cargar_alertas()) == [0]
+    vencida = cambio + pd.Timedelta(days=cumplimiento.DIAS_CAMBIO_SALARIO + 1)
+    assert _marcados(cumplimiento.materializar(fecha=vencida)) == []
+
+    # Reconvertir sin cambios conserva el registro del cambio anterior
+    _cambiar_salarios({})
+    assert _marcados(cumplimiento.cargar_alertas()) == [0]
+    historial = almacen.cargar_tabla(almacen.TABLA_HISTORIAL_SALARIOS)
+    assert np.isin(historial['id'], [1, 2]).all() and len(historial) == 2
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import optimizacion
+import sintetico
+
+
+@pytest.fixture
+def datos():
+    rng = np.random.default_rng(0)
+    afiliados = sintetico.generar_afiliados(rng, np.arange(1, 1001))
+    proyecciones = sintetico.generar_proyecciones(rng, afiliados)
+    datos = afiliados.merge(proyecciones, on='id')
+    datos['aportacion'] = rng.uniform(0, 2000, len(datos))
+    return datos
+
+
+def test_arranque_en_caliente_sin_cambios(datos):
+    previa = optimizacion.optimizar(datos, sintetico.FONDOS)
+    solucion = optimizacion.optimizar(datos, sintetico.FONDOS, previa)
+    assert not solucion['recalculado'].any()
+    np.testing.assert_array_equal(solucion['mezcla'], previa['mezcla'])
+
+
+def test_arranque_en_caliente_con_altas_y_bajas(datos):
+    previa = optimizacion.optimizar(datos, sintetico.FONDOS)
+    # Se da de baja el afiliado 10 y de alta el 5000 (al final)
+    actuales = pd.concat([datos[datos['id'] != 10], datos.iloc[[0]].assign(id=5000)], ignore_index=True)
+
+    with np.errstate(all='raise'):
+        solucion = optimizacion.optimizar(actuales, sintetico.FONDOS, previa)
+    assert solucion.loc[solucion['recalculado'], 'id'].tolist() == [5000]
+    conservados = previa.set_index('id').loc[solucion['id'].iloc[:-1], 'mezcla'].to_numpy()
+    np.testing.assert_array_equal(solucion['mezcla'].iloc[:-1], conservados)
+
+
+def test_fondo_actual_inexistente(datos):
+    datos.loc[3, 'fondo_actual'] = 'SIEFORE Inexistente'
+    with pytest.raises(ValueError, match='SIEFORE Inexistente'):
+        optimizacion.optimizar(datos, sintetico.FONDOS)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import perezoso
+
+
+def test_calculo_largo_no_bloquea_otros_nodos():
+    empezado, liberar = threading.Event(), threading.Event()
+    llamadas = []
+
+    def lento():
+        llamadas.append('lento')
+        empezado.set()
+        liberar.wait(5)
+        return 1
+
+    grafo = perezoso.GrafoDatos([perezoso.Nodo('lento', lento), perezoso.Nodo('rapido', lambda: 2),
+                                 perezoso.Nodo('suma', lambda a, b: a + b, ('lento', 'rapido'))])
+    hilos = [threading.Thread(target=grafo.obtener, args=('suma', 1)) for _ in range(3)]
+    for hilo in hilos:
+        hilo.start()
+    assert empezado.wait(5)
+    # Mientras 'lento' se calcula, otro nodo responde sin esperar
+    resultado = []
+    consulta = threading.Thread(target=lambda: resultado.append(grafo.obtener('rapido', 1)))
+    consulta.start()
+    consulta.join(1)
+    assert resultado == [2]
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+    assert grafo.obtener('suma', 1) == 3
+    assert llamadas == ['lento']